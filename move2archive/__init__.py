@@ -3,19 +3,33 @@
 PROG_VERSION = u"Time-stamp: <2024-12-25 16:03:41 vk>"
 
 import os
+import stat
 import sys
 import re
 import logging
 from optparse import OptionParser
-from datetime import datetime
+from datetime import datetime, timedelta
 import shutil
-import fnmatch  # for searching matching directories
-import readline  # for raw_input() reading from stdin
+import errno
+import collections
+import bisect  # for prefix lookups in sorted lists
+import itertools
+import time
+import threading
+import contextlib
+
+## Modules which are only needed for some features are imported where
+## they are used to keep the startup fast (see LAZY_MODULES):
+## readline (interactive mode), sqlite3 (archive index and vocabulary
+## cache), concurrent.futures ("--jobs"), json ("--journal",
+## "--metrics-json"), ctypes, select and struct ("--watch"), hashlib
+## and fcntl (copying across devices) and subprocess ("--idle-io").
+LAZY_MODULES = ['readline', 'sqlite3', 'concurrent.futures', 'json', 'ctypes', 'select', 'struct', 'hashlib',
+                'fcntl', 'subprocess']
 
 # TODO:
 # * fix parts marked with «FIXXME»
 # * document "using default folder when no target folder given in interactive mode"
-# * get_potential_target_directories(): list also folders with datestamps of 1-2 days before
 # * think of documenting HIDDEN FEATURES marked below
 
 # better performance if ReEx is pre-compiled:
@@ -23,13 +37,107 @@ import readline  # for raw_input() reading from stdin
 # search for: «YYYY-MM-DD»
 DATESTAMP_REGEX = re.compile(r"\d\d\d\d-[01]\d-[0123]\d")
 
+# search for: datestamp or timestamp (and separators) in front of the name of an event folder
+FOLDERNAME_DATESTAMP_PREFIX_REGEX = re.compile(r"\d\d\d\d-[01]\d-[0123]\d(T[012]\d[.:][0-5]\d([.:][0-5]\d)?)?[ _-]*")
+
+# search for: «THH.MM» or «THH:MM» right after a datestamp
+TIMESTAMP_SUFFIX_REGEX = re.compile(r"T[012]\d[.:][0-5]\d")
+
+## all valid «MM-DD» of a leap year; decoding datestamps with this table is much faster than strptime():
+VALID_MONTH_DAYS = {'%02d-%02d' % (month, day): (month, day)
+                    for month, days in enumerate((31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31), 1)
+                    for day in range(1, days + 1)}
+
 ## this setting is highly specific for the current user and most probably needs adaptation:
-if os.path.isdir(os.path.join(os.path.expanduser("~"), "archive", "events_memories")):
-    ## this is the author's personal choice according to https://karl-voit.at/folder-hierarchy/
-    DEFAULT_ARCHIVE_PATH = os.path.join(os.path.expanduser("~"), "archive", "events_memories")
-else:
-    ## this is the more generic choice:
-    DEFAULT_ARCHIVE_PATH = os.path.join(os.path.expanduser("~"), "archive")
+## this is the author's personal choice according to https://karl-voit.at/folder-hierarchy/
+PERSONAL_ARCHIVE_PATH = os.path.join(os.path.expanduser("~"), "archive", "events_memories")
+## this is the more generic choice:
+GENERIC_ARCHIVE_PATH = os.path.join(os.path.expanduser("~"), "archive")
+
+## index of the (datestamped) directories within the year folders of the archive:
+ARCHIVE_INDEX_FILENAME = ".move2archive-index.sqlite"
+
+## number of bytes at the start and at the end of a file which are
+## hashed before the whole file is hashed for finding duplicates:
+PARTIAL_HASH_SIZE = 64 * 1024
+
+## year folders of an archive:
+YEARFOLDER_REGEX = re.compile(r"^\d\d\d\d$")
+
+## cache of the words of file names per directory for TAB completion:
+VOCABULARY_CACHE_FILE = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                     "move2archive", "vocabulary.sqlite")
+
+## cache of the capture dates read from the metadata of files ("--metadata-dates"):
+METADATA_CACHE_FILE = os.path.join(os.path.dirname(VOCABULARY_CACHE_FILE), "metadata-dates.sqlite")
+
+## number of bytes read from the start of an image for finding its EXIF data:
+METADATA_HEADER_SIZE = 64 * 1024
+
+## maximum number of boxes of an MP4/QuickTime video checked for its movie header:
+METADATA_MAXIMUM_BOXES = 64
+
+## number of files whose metadata is read at the same time:
+METADATA_WORKERS = 8
+
+## first box types of MP4/QuickTime videos:
+MP4_BOX_TYPES = (b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot')
+
+## maximum number of file names analyzed for guessing a new directory name:
+GUESS_SAMPLE_SIZE = 200
+
+## default number of existing folders of any date suggested by the similarity of their names:
+NAME_SUGGESTIONS = 5
+
+## minimum share of common trigrams of the words of a folder name and of the file names:
+NAME_SUGGESTION_MINIMUM_SIMILARITY = 0.3
+
+## the score of a folder suggested by name is halved when its date is this many days away:
+NAME_SUGGESTION_HALF_SCORE_DAYS = 30
+
+## number of folders sharing the most trigrams with the file names which are scored:
+NAME_SUGGESTION_CANDIDATES = 200
+
+## maximum number of entries of the name index read for finding the candidates: the rarest
+## trigrams of the file names are searched in all folder names, the others only in the
+## folder names of the days around the items for which this number is not exceeded:
+NAME_INDEX_MAXIMUM_POSTINGS = 10000
+
+## archive roots with less free space are only used for years they
+## already contain if no other archive root is possible (in bytes):
+MINIMUM_FREE_SPACE = 1024 * 1024 * 1024
+
+## format of "--archive-root": an optional range of years and a directory
+ARCHIVE_ROOT_REGEX = re.compile(r'^(?:(?P<first>\d{4})?-(?P<last>\d{4})?=)?(?P<path>.+)$')
+
+## size of the chunks when copying across devices:
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+## size of the chunks when copying with "--max-bandwidth" or "--backoff":
+THROTTLED_CHUNK_SIZE = 1024 * 1024
+
+## "--backoff" slows down when copying a chunk takes this many times longer than usual:
+BACKOFF_LATENCY_FACTOR = 2.0
+
+## range of the delay after each chunk with "--backoff" (in seconds):
+BACKOFF_MINIMUM_DELAY = 0.01
+BACKOFF_MAXIMUM_DELAY = 2.0
+
+## flag of renameat2() on Linux which makes a rename fail instead of replacing an existing entry:
+RENAME_NOREPLACE = 1
+AT_FDCWD = -100
+
+## ioctl request for cloning a file (reflink) on Linux file systems like btrfs or XFS:
+FICLONE = 0x40049409
+
+## layout of the directories within an archive root: one folder per year
+DEFAULT_LAYOUT = "{year}"
+
+## seconds to wait for the suggestions before the prompt is shown anyway:
+PREFETCH_PROMPT_DELAY = 0.3
+
+## number of items of --from-file that are planned and moved at once:
+STREAM_CHUNK_SIZE = 1000
 
 PAUSEONEXITTEXT = "    press <Enter> to quit"
 PROG_VERSION_DATE = PROG_VERSION[13:23]
@@ -84,7 +192,8 @@ parser.add_option("-d", "--directory", dest="targetdir",
 parser.add_option("--batchmode", dest="batchmode", action="store_true",
                   help='suppress interactive asking for anything. If no --directory is given, ' +
                        'the DEFAULT + year of the date-stamp within the file name is used:' +
-                       '"%s" (which can be modified in "%s")' % (DEFAULT_ARCHIVE_PATH, sys.argv[0]))
+                       '"%s" if it exists, otherwise "%s" (which can be modified in "%s")' %
+                       (PERSONAL_ARCHIVE_PATH, GENERIC_ARCHIVE_PATH, sys.argv[0]))
 
 parser.add_option("-a", "--append", dest="append", action="store_true",
                   help="if target directory already exists, append to it " +
@@ -92,28 +201,233 @@ parser.add_option("-a", "--append", dest="append", action="store_true",
 
 parser.add_option("--archivepath", dest="archivepath",
                   help='overwrite the default archive base directory which contains one ' +
-                       'subdirectory per year. DEFAULT is currently "%s" (which can be modified in "%s")' % (DEFAULT_ARCHIVE_PATH, sys.argv[0]), metavar="DIR")
+                       'subdirectory per year. DEFAULT is "%s" if it exists, otherwise "%s" (which can be modified in "%s")' %
+                       (PERSONAL_ARCHIVE_PATH, GENERIC_ARCHIVE_PATH, sys.argv[0]), metavar="DIR")
+
+parser.add_option("--layout", dest="layout", default=DEFAULT_LAYOUT,
+                  help='directories of items and new event folders within the archive base directory: "{year}" ' +
+                       'followed by any of "{year}", "{month}", "{day}" and "{bucket}" (one of 256 buckets of ' +
+                       'the name), e.g. "{year}/{year}-{month}". Folders below existing year folders are ' +
+                       'created as needed. DEFAULT is "%s"' % DEFAULT_LAYOUT, metavar="TEMPLATE")
+
+parser.add_option("--reshard", dest="reshard", action="store_true",
+                  help='moves the items of the year folders given as arguments into the directories of ' +
+                       '"--layout"; items without datestamp or of other years are left alone')
+
+parser.add_option("--archive-root", dest="archive_roots", action="append",
+                  help='an additional archive base directory, e.g. on another disk. With a range of years ' +
+                       '("2000-2019=DIR", "-2019=DIR", "2020-=DIR"), the years are placed in DIR only. Other years ' +
+                       'go to the archive base directory where their year folder exists or with the most free ' +
+                       'space. Suggestions are searched in all of them. May be given multiple times.',
+                  metavar="[YEARS=]DIR")
 
 # parser.add_option("-b", "--batch", dest="batchmode", action="store_true",
 #                   help="Do not ask for user interaction (at the end of the process)")
 
+parser.add_option("--suggestion-range", dest="suggestion_range", type="int", default=0,
+                  help="in interactive mode, also suggest existing directories with a datestamp " +
+                       "up to DAYS days before or after the datestamp of the first item. DEFAULT is 0", metavar="DAYS")
+
+parser.add_option("--name-suggestions", dest="name_suggestions", type="int", default=NAME_SUGGESTIONS,
+                  help="in interactive mode, also suggest up to NUMBER existing folders of any date whose names " +
+                       "are similar to the words the file names have in common; folders closer to the datestamp " +
+                       "of the first item first. 0 disables it. DEFAULT is %i" % NAME_SUGGESTIONS, metavar="NUMBER")
+
+parser.add_option("--complete-archive-folders", dest="complete_archive_folders", action="store_true",
+                  help="in interactive mode, TAB also completes names of existing folders of the archive " +
+                       "(without their datestamps) as known to the archive index")
+
+parser.add_option("--journal", dest="journal",
+                  help="append the planned moves and the moves done to the journal FILE (JSON lines). " +
+                       'With "--dryrun", only the plan is written which "--resume" can execute later.', metavar="FILE")
+
+parser.add_option("--resume", dest="resume",
+                  help="execute the planned moves of the journal FILE that are not done yet " +
+                       "(e.g., after an interruption)", metavar="FILE")
+
+parser.add_option("--undo", dest="undo",
+                  help="move the items back which were moved according to the journal FILE", metavar="FILE")
+
+parser.add_option("--stats", dest="stats", action="store_true",
+                  help="print the time spent per phase and the numbers of moved, skipped and failed items at the end")
+
+parser.add_option("--metrics-json", dest="metrics_json",
+                  help="write the time spent per phase and the numbers of moved, skipped and failed items " +
+                       "as JSON to FILE at the end", metavar="FILE")
+
+parser.add_option("--max-bandwidth", dest="max_bandwidth",
+                  help='maximum number of bytes per second copied across devices, e.g. "20M" ' +
+                       '(suffixes k, M, G are powers of 1024)', metavar="BYTES")
+
+parser.add_option("--max-files-per-sec", dest="max_files_per_sec", type="float",
+                  help="maximum number of items moved per second", metavar="N")
+
+parser.add_option("--backoff", dest="backoff", action="store_true",
+                  help="copy slower while copying takes longer than usual, e.g. because other " +
+                       "programs use the same disks")
+
+parser.add_option("--idle-io", dest="idle_io", action="store_true",
+                  help='use the idle I/O scheduling class (like "ionice -c 3"; Linux only) so that other ' +
+                       "programs get their disk I/O first")
+
+parser.add_option("--verify", dest="verify", action="store_true",
+                  help="when moving across devices, compute a SHA-256 checksum while copying and compare it " +
+                       "with the checksum of the copy before the original gets deleted")
+
 parser.add_option("--dryrun", dest="dryrun", action="store_true",
                   help="Does not make any changes to the file system. Useful for testing behavior.")
 
+parser.add_option("-j", "--jobs", dest="jobs", type="int", default=1,
+                  help="number of items that are moved at the same time. Values larger than 1 speed up " +
+                       "moving many items to an archive on a different file system. DEFAULT is 1", metavar="N")
+
+parser.add_option("--from-file", dest="from_file",
+                  help='read the items from FILE, one per line ("-" reads from stdin). Items are ' +
+                       'moved while reading; errors abort after the items read so far were moved. ' +
+                       'Requires "--batchmode" or "--directory".', metavar="FILE")
+
+parser.add_option("--stdin", dest="from_file", action="store_const", const="-",
+                  help='read the items from stdin; same as "--from-file -"')
+
+parser.add_option("-0", "--null", dest="null_delimited", action="store_true",
+                  help='items of "--from-file" are separated by null characters (like "find -print0")')
+
+parser.add_option("--metadata-dates", dest="metadata_dates", action="store_true",
+                  help="for items without a datestamp in their name, use the capture date of the EXIF data of " +
+                       "JPEG and TIFF based images or of the header of MP4/QuickTime videos")
+
+parser.add_option("--duplicates", dest="duplicates", type="choice", choices=['skip', 'report'],
+                  help='check whether the content of a file is in the archive already: "skip" does not move ' +
+                       'such files, "report" only warns about them. The archive index is extended by the sizes ' +
+                       'and hashes of all archived files for this.', metavar="skip|report")
+
+parser.add_option("--cluster", dest="cluster", action="store_true",
+                  help="split all items into events and move each event to its own directory without asking: " +
+                       "items are sorted by their datestamps and a new event starts after a gap of more than " +
+                       "\"--cluster-gap\" days or when the names have no word in common. Directory names are " +
+                       "guessed from the file names and matching existing directories are appended to. Items of " +
+                       "events without a name are moved to <archivepath>/<YYYY>")
+
+parser.add_option("--cluster-gap", dest="cluster_gap", type="int", default=1,
+                  help='number of days without items that may be within an event of "--cluster". DEFAULT is 1',
+                  metavar="DAYS")
+
+parser.add_option("--watch", dest="watch", action="append",
+                  help="keep running and move every item that appears in the inbox directory DIR " +
+                       "to <archivepath>/<YYYY>. May be given multiple times.", metavar="DIR")
+
+parser.add_option("--watch-settle-time", dest="watch_settle_time", type="float", default=5.0,
+                  help="in watch mode, move an item only after it did not change for SECONDS seconds. " +
+                       "DEFAULT is 5", metavar="SECONDS")
+
 parser.add_option("--pauseonexit", dest="pauseonexit", action="store_true",
                   help="Asks for pressing the Enter key on any exit.")
 
 parser.add_option("-v", "--verbose", dest="verbose", action="store_true",
                   help="enable verbose mode")
 
+parser.add_option("-q", "--quiet", dest="quiet", action="store_true",
+                  help="do not print each moved item with its destination")
+
 parser.add_option("--version", dest="version", action="store_true",
                   help="display version and exit")
 
-(options, args) = parser.parse_args()
+## the command line is parsed in main(); library users get the defaults (see get_options()):
+options = parser.get_default_values()
+args = []
 
 global user_selected_suggested_directory
 user_selected_suggested_directory = False
 
+## MoveJournal of the current run or None:
+journal = None
+
+## Metrics of the current run or None (when neither "--stats" nor "--metrics-json" is given):
+metrics = None
+
+## renameat2() of the C library; None if not looked up yet, False if not available:
+renameat2_function = None
+
+## IOThrottle of the current run or None (without "--max-bandwidth", "--max-files-per-sec" and "--backoff"):
+throttle = None
+
+
+class ArchiveError(Exception):
+    """raised by error_exit(); main() turns it into the exit code of the program"""
+
+    def __init__(self, errorcode, text):
+        super().__init__(text)
+        self.errorcode = errorcode
+        self.text = text
+
+
+def get_default_archive_path():
+    """returns the default archive path; the file system is only checked
+    when it is needed and not on every start of the program"""
+
+    if os.path.isdir(PERSONAL_ARCHIVE_PATH):
+        return PERSONAL_ARCHIVE_PATH
+    else:
+        return GENERIC_ARCHIVE_PATH
+
+
+ArchiveRoot = collections.namedtuple('ArchiveRoot', 'path first_year last_year')
+
+
+def parse_archive_root(value):
+    """parses a value of "--archive-root" like "2000-2019=/mnt/disk2/archive"
+    into an ArchiveRoot; raises ValueError if it is not valid"""
+
+    components = ARCHIVE_ROOT_REGEX.match(value)
+    if not components:
+        raise ValueError('"%s" is no valid archive root' % value)
+    first_year = components.group('first') and int(components.group('first'))
+    last_year = components.group('last') and int(components.group('last'))
+    if first_year and last_year and first_year > last_year:
+        raise ValueError('the range of years of "%s" is empty' % value)
+    return ArchiveRoot(components.group('path'), first_year, last_year)
+
+
+def get_archive_roots(archivepath):
+    """returns the archive roots: archivepath for all years and the
+    additional ones of "--archive-root" """
+
+    return [ArchiveRoot(archivepath, None, None)] + [parse_archive_root(value) for value in options.archive_roots or []]
+
+
+def select_archive_root(archivepath, year):
+    """returns the archive root directory for new items of a year.
+
+    Archive roots with a range of years containing year are preferred.
+    Among the possible roots, the first one which already contains the
+    year folder and is not full (see MINIMUM_FREE_SPACE) is chosen;
+    otherwise the one with the most free space."""
+
+    roots = get_archive_roots(archivepath)
+    if len(roots) == 1:
+        return archivepath
+
+    candidates = [root for root in roots if (root.first_year or root.last_year) and
+                  (root.first_year or year) <= year <= (root.last_year or year)]
+    if not candidates:
+        candidates = [root for root in roots if not (root.first_year or root.last_year)]
+    if len(candidates) == 1:
+        return candidates[0].path
+
+    free_space = {}
+    for root in candidates:
+        try:
+            free_space[root.path] = shutil.disk_usage(root.path).free
+        except OSError:
+            free_space[root.path] = 0
+
+    for root in candidates:
+        if free_space[root.path] >= MINIMUM_FREE_SPACE and os.path.isdir(os.path.join(root.path, str(year))):
+            return root.path
+    root = max(candidates, key=lambda root: free_space[root.path])
+    logging.debug('placing year %i in archive root "%s" with %i bytes free' % (year, root.path, free_space[root.path]))
+    return root.path
+
 
 def handle_logging():
     """Log handling and configuration"""
@@ -126,37 +440,299 @@ def handle_logging():
         logging.basicConfig(level=logging.INFO, format=FORMAT)
 
 
-def error_exit(errorcode, text):
-    """exits with return value of errorcode and prints to stderr"""
+class MoveJournal(object):
+    """append-only journal of planned and executed moves with one JSON
+    object per line. Each record holds the operation ("mkdir",
+    "planned", "done", "skipped" or "undone"), the absolute path of the
+    item and the absolute path of its destination directory.
+
+    Records are flushed immediately so that an interrupted run leaves a
+    complete record of what was done so far."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.file = open(filename, 'a', encoding='utf-8')
+
+    def record(self, operation, item, destination):
+        import json
+        line = json.dumps({'op': operation,
+                           'item': os.path.abspath(item) if item else None,
+                           'destination': os.path.abspath(destination)}, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def record_plan(self, plan):
+        for (destination, same_device), itemnames in plan.items():
+            for itemname in itemnames:
+                self.record('planned', itemname, destination)
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    @staticmethod
+    def read(filename):
+        """returns the list of records of a journal file"""
+
+        import json
+        records = []
+        with open(filename, encoding='utf-8') as journalfile:
+            for line in journalfile:
+                if line.strip():
+                    records.append(json.loads(line))
+        return records
+
+
+class Metrics(object):
+    """collects the wall time per phase and counters of a run.
+
+    Phases may be nested: the time of an inner phase is not added to
+    the outer phase so that the phase times sum up to the total time."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phase_seconds = collections.OrderedDict()
+        self.counters = collections.Counter()
+        self.lock = threading.Lock()
+        self.running_phases = []  # list of [name, start of the current time slice]
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        now = time.perf_counter()
+        if self.running_phases:
+            self.stop_time_slice(now)
+        self.running_phases.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.stop_time_slice(now)
+            self.running_phases.pop()
+            if self.running_phases:
+                self.running_phases[-1][1] = now
+
+    def stop_time_slice(self, now):
+        name, start = self.running_phases[-1]
+        self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + now - start
+
+    @contextlib.contextmanager
+    def background_phase(self, name):
+        """measures a phase of a background thread as "<name> (background)";
+        it overlaps with the phases of the main thread"""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                name += ' (background)'
+                self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def get_report(self):
+        """returns the metrics as a dict"""
+
+        total_seconds = time.perf_counter() - self.start
+        moved_files = self.counters['moved files']
+        moves_seconds = self.phase_seconds.get('moves', 0.0)
+        return {'total seconds': round(total_seconds, 6),
+                'phase seconds': dict((name, round(seconds, 6)) for name, seconds in self.phase_seconds.items()),
+                'counters': dict(self.counters),
+                'files per second': round(moved_files / moves_seconds, 1) if moves_seconds else None}
+
+    def print_report(self):
+        report = self.get_report()
+        print('\nstatistics (total %.3fs):' % report['total seconds'])
+        for name, seconds in report['phase seconds'].items():
+            print('  %-22s %10.3fs' % (name, seconds))
+        for name, value in sorted(report['counters'].items()):
+            print('  %-22s %10i' % (name, value))
+        if report['files per second']:
+            print('  %-22s %10.1f' % ('files per second', report['files per second']))
+
+
+def measure_phase(name):
+    """returns a context manager measuring the wall time of a phase (if metrics are enabled)"""
+
+    # phases of the main thread are nested; phases of background threads
+    # are reported separately as they overlap with them:
+    if not metrics:
+        return contextlib.nullcontext()
+    if threading.current_thread() is threading.main_thread():
+        return metrics.phase(name)
+    return metrics.background_phase(name)
+
+
+def count_metric(name, value=1):
+    """increases a counter of the metrics (if metrics are enabled)"""
+
+    if metrics:
+        metrics.count(name, value)
+
+
+class TokenBucket(object):
+    """limits a rate to rate units per second with bursts of up to
+    capacity units. Callers may take more units than available and
+    wait for them; this is shared fairly by several threads."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = capacity or max(self.rate, 1.0)
+        self.tokens = self.capacity
+        self.timestamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        """waits until amount units may be used; returns the seconds waited"""
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+            self.timestamp = now
+            self.tokens -= amount
+            waiting_time = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if waiting_time > 0:
+            time.sleep(waiting_time)
+        return waiting_time
+
+
+class IOThrottle(object):
+    """schedules the I/O of moves: token buckets for the bytes copied
+    and the items moved per second and an adaptive back-off which
+    delays each chunk while copying is slower than usual.
+
+    The back-off compares a fast and a slow moving average of the
+    seconds per byte of the copied chunks: the delay doubles while the
+    fast one exceeds BACKOFF_LATENCY_FACTOR times the slow one and is
+    halved otherwise."""
+
+    def __init__(self, max_bandwidth=None, max_files_per_sec=None, backoff=False):
+        self.bandwidth = max_bandwidth and TokenBucket(max_bandwidth, max(max_bandwidth, THROTTLED_CHUNK_SIZE))
+        self.files = max_files_per_sec and TokenBucket(max_files_per_sec)
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.recent_latency = None
+        self.usual_latency = None
+        self.delay = 0.0
+
+    def wait_for_item(self):
+        """waits until the next item may be moved"""
+
+        if self.files:
+            count_metric('throttled milliseconds', int(self.files.consume(1) * 1000))
+
+    def copied(self, size, seconds):
+        """accounts a copied chunk of size bytes which took seconds and
+        waits as long as the limits require"""
+
+        waiting_time = 0.0
+        if self.bandwidth:
+            waiting_time += self.bandwidth.consume(size)
+        if self.backoff and size:
+            with self.lock:
+                latency = seconds / size
+                if self.usual_latency is None:
+                    self.recent_latency = self.usual_latency = latency
+                self.recent_latency = 0.7 * self.recent_latency + 0.3 * latency
+                self.usual_latency = 0.99 * self.usual_latency + 0.01 * latency
+                if self.recent_latency > BACKOFF_LATENCY_FACTOR * self.usual_latency:
+                    self.delay = min(BACKOFF_MAXIMUM_DELAY, max(BACKOFF_MINIMUM_DELAY, 2 * self.delay))
+                    logging.debug('copying got slower: waiting %.3fs after each chunk' % self.delay)
+                elif self.delay:
+                    self.delay = self.delay / 2 if self.delay > BACKOFF_MINIMUM_DELAY else 0.0
+                delay = self.delay
+            if delay:
+                time.sleep(delay)
+                waiting_time += delay
+        if waiting_time:
+            count_metric('throttled milliseconds', int(waiting_time * 1000))
+
+
+def parse_byte_size(text):
+    """returns the number of bytes of a text like "500k" or "20M"; raises
+    ValueError if it is no valid size"""
+
+    factors = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+    components = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$', text, re.IGNORECASE)
+    if not components or float(components.group(1)) <= 0:
+        raise ValueError('"%s" is no valid number of bytes' % text)
+    return int(float(components.group(1)) * factors[components.group(2).lower()])
+
+
+def set_idle_io_priority():
+    """moves this process into the idle I/O scheduling class (Linux only);
+    threads started afterwards inherit it"""
+
+    import subprocess
+    try:
+        subprocess.run(['ionice', '-c', '3', '-p', str(os.getpid())], check=True)
+        logging.debug('using the idle I/O scheduling class')
+    except (OSError, subprocess.CalledProcessError) as detail:
+        logging.warning('Can not use the idle I/O scheduling class: %s' % detail)
 
-    sys.stdout.flush()
-    logging.error(text)
 
-    if options.dryrun or options.pauseonexit:
-        input(PAUSEONEXITTEXT)
+def count_moved_item(destinationfilename, method):
+    """counts a moved file or directory and its bytes (if metrics are
+    enabled); method is "renamed" or "copied" """
+
+    if not metrics:
+        return
+    if os.path.isdir(destinationfilename) and not os.path.islink(destinationfilename):
+        metrics.count('moved directories')
+        size = 0
+        for root, dirs, files in os.walk(destinationfilename):
+            for filename in files:
+                try:
+                    size += os.lstat(os.path.join(root, filename)).st_size
+                except OSError:
+                    pass
+    else:
+        metrics.count('moved files')
+        size = os.lstat(destinationfilename).st_size
+    metrics.count('bytes ' + method, size)
+
 
-    sys.exit(errorcode)
+def journal_move(operation, item, destination):
+    """records an operation in the journal of the current run (if any)"""
+
+    if journal:
+        journal.record(operation, item, destination)
+
+
+def error_exit(errorcode, text):
+    """aborts the current processing by raising an ArchiveError. When
+    called from the command line, main() prints the text to stderr and
+    exits with return value of errorcode."""
+
+    raise ArchiveError(errorcode, text)
 
 
 class SimpleCompleter(object):
     # happily stolen from http://pymotw.com/2/readline/
-
-    def __init__(self, options):
-        self.options = sorted(options)
+    # matches are looked up by bisecting sorted lists instead of checking each option.
+    # phrases (like folder names containing spaces) are matched against the whole line.
+    # matching options are returned in the order given (e.g. most frequent first).
+
+    def __init__(self, options, phrases=()):
+        self.ranked_options = list(dict.fromkeys(options))
+        self.ranks = dict((option, rank) for rank, option in enumerate(self.ranked_options))
+        self.options = sorted(self.ranks)
+        self.phrases = sorted(set(phrases))
         return
 
     def complete(self, text, state):
         response = None
         if state == 0:
+            import readline
             # This is the first time for this text, so build a match list.
-            if text:
-                self.matches = [s
-                                for s in self.options
-                                if s and s.startswith(text)]
-                logging.debug('%s matches: %s', repr(text), self.matches)
-            else:
-                self.matches = self.options[:]
-                logging.debug('(empty input) matches: %s', self.matches)
+            self.matches = self.find_matches(text, readline.get_line_buffer()[:readline.get_endidx()],
+                                             readline.get_begidx())
+            logging.debug('%s matches: %s', repr(text), self.matches)
 
         # Return the state'th item from the match list,
         # if we have that many.
@@ -168,28 +744,70 @@ class SimpleCompleter(object):
                       repr(text), state, repr(response))
         return response
 
+    def find_matches(self, text, line='', begidx=0):
+        """returns the options starting with text in their given order and
+        the remainders (from begidx on) of the phrases starting with line"""
+
+        if not text and not line.strip():
+            return self.ranked_options[:]
+
+        matches = sorted(self.find_prefix_matches(self.options, text), key=self.ranks.get) if text else []
+        if line.strip():
+            known_matches = set(matches)
+            for phrase in self.find_prefix_matches(self.phrases, line):
+                if phrase[begidx:] not in known_matches:
+                    known_matches.add(phrase[begidx:])
+                    matches.append(phrase[begidx:])
+        return matches
+
+    @staticmethod
+    def find_prefix_matches(sorted_strings, prefix):
+        """returns the strings of the sorted list starting with prefix"""
+
+        start = bisect.bisect_left(sorted_strings, prefix)
+        end = bisect.bisect_left(sorted_strings, prefix + '\U0010ffff', start)
+        return sorted_strings[start:end]
+
+
+class PrefetchedCompleter(object):
+    """TAB completion with the words of get_completion_words() which are
+    collected in the background; the first completion waits for them
+    if they are not ready yet"""
+
+    def __init__(self, future):
+        self.future = future
+        self.completer = None
+
+    def complete(self, text, state):
+        if self.completer is None:
+            try:
+                vocabulary, folder_names = self.future.result()
+            except Exception as detail:
+                logging.debug('no TAB completion: %s' % detail)
+                vocabulary, folder_names = [], []
+            self.completer = SimpleCompleter(vocabulary, folder_names)
+        return self.completer.complete(text, state)
+
 
-def locate_and_parse_controlled_vocabulary():
+def locate_and_parse_controlled_vocabulary(directory='.'):
     """This method is looking for filenames in the current directory
     and parses them. This results in a list of words which are used for tab completion.
+    The list is cached per directory until the mtime of the directory changes.
 
-    @param return: either False or a list of found words (strings)
+    @param return: either False or a list of found words (strings), most frequent first
 
     """
 
-    cv = []
-    files = [f for f in os.listdir('.') if os.path.isfile(f)]
-    for f in files:
-        # extract all words from the file name that don't contain numbers
-        new_items = FILENAME_COMPONENT_REGEX.findall(os.path.splitext(os.path.basename(f))[0])
-        # remove words that are too small
-        new_items = [item for item in new_items if len(item) > 1]
-        # remove words that are listed in the blacklist
-        new_items = [item for item in new_items if item.lower() not in FILENAME_COMPONENT_LOWERCASE_BLACKLIST]
-        # remove words that are already in the controlled vocabulary
-        new_items = [item for item in new_items if item not in cv]
-        # append newly found words to the controlled vocabulary
-        cv.extend(new_items)
+    directory = os.path.abspath(directory)
+    mtime = os.stat(directory).st_mtime_ns
+    cv = read_cached_vocabulary(directory, mtime)
+    if cv is None:
+        with os.scandir(directory) as entries:
+            filenames = [entry.name for entry in entries if entry.is_file()]
+        cv = extract_vocabulary_from_filenames(filenames)
+        write_cached_vocabulary(directory, mtime, cv)
+    else:
+        logging.debug('using cached vocabulary of "%s"' % directory)
 
     if len(cv) > 0:
         return cv
@@ -197,18 +815,349 @@ def locate_and_parse_controlled_vocabulary():
         return False
 
 
+def extract_vocabulary_from_filenames(filenames):
+    """returns the words of the filenames, ranked by their frequency (most frequent first)"""
+
+    blacklist = set(FILENAME_COMPONENT_LOWERCASE_BLACKLIST)
+    word_counts = collections.Counter()
+    for filename in filenames:
+        # extract all words from the file name that don't contain numbers
+        for word in FILENAME_COMPONENT_REGEX.findall(os.path.splitext(filename)[0]):
+            # remove words that are too small or listed in the blacklist
+            if len(word) > 1 and word.lower() not in blacklist:
+                word_counts[word] += 1
+    return [word for word, count in word_counts.most_common()]
+
+
+def open_vocabulary_cache():
+    """opens the cache of vocabularies (and creates it if necessary)"""
+
+    import sqlite3
+    os.makedirs(os.path.dirname(VOCABULARY_CACHE_FILE), exist_ok=True)
+    connection = sqlite3.connect(VOCABULARY_CACHE_FILE, timeout=5)
+    with connection:
+        connection.execute('CREATE TABLE IF NOT EXISTS vocabularies ('
+                           'directory TEXT PRIMARY KEY, mtime INTEGER NOT NULL, words TEXT NOT NULL)')
+    return connection
+
+
+def read_cached_vocabulary(directory, mtime):
+    """returns the cached vocabulary of directory if it is still valid for mtime, otherwise None"""
+
+    import sqlite3
+
+    try:
+        connection = open_vocabulary_cache()
+        try:
+            row = connection.execute('SELECT words FROM vocabularies WHERE directory = ? AND mtime = ?',
+                                     (directory, mtime)).fetchone()
+        finally:
+            connection.close()
+    except (OSError, sqlite3.Error) as detail:
+        logging.debug('can not read vocabulary cache "%s": %s' % (VOCABULARY_CACHE_FILE, detail))
+        return None
+
+    if row is None:
+        return None
+    # words consist of letters only, so newlines are safe separators:
+    return row[0].split('\n') if row[0] else []
+
+
+def write_cached_vocabulary(directory, mtime, words):
+    """stores the vocabulary of directory in the cache (not in dryrun mode)"""
+
+    if options.dryrun:
+        return
+    import sqlite3
+    try:
+        connection = open_vocabulary_cache()
+        try:
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO vocabularies VALUES (?, ?, ?)',
+                                   (directory, mtime, '\n'.join(words)))
+        finally:
+            connection.close()
+    except (OSError, sqlite3.Error) as detail:
+        logging.debug('can not write vocabulary cache "%s": %s' % (VOCABULARY_CACHE_FILE, detail))
+
+
+def parse_datestamp(text):
+    """returns a datetime-object of the first datestamp in text if it is a valid date, otherwise returns None."""
+
+    components = DATESTAMP_REGEX.search(text)
+    if not components:
+        return None
+    datestamp = components.group()
+    month_day = VALID_MONTH_DAYS.get(datestamp[5:])
+    year = int(datestamp[:4])
+    if not month_day or year < 1 or (month_day == (2, 29) and not is_leap_year(year)):
+        return None
+    return datetime(year, month_day[0], month_day[1])
+
+
+def is_leap_year(year):
+    """returns true if year is a leap year"""
+
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
 def extract_date(text):
     """extracts the date from a text. Returns a datetime-object if a valid date was found, otherwise returns None."""
 
-    components = re.search(DATESTAMP_REGEX, os.path.basename(text.strip()))
+    return parse_datestamp(os.path.basename(text.strip()))
+
+
+class ArchiveItem(object):
+    """an item (file or directory) to archive with its datestamp parsed
+    once; all later steps use these attributes"""
+
+    __slots__ = ('path', 'basename', 'date', 'year', 'has_time')
+
+    def __init__(self, path):
+        self.path = path
+        self.basename = os.path.basename(path)
+        self.date = None
+        self.year = None
+        self.has_time = False
+
+        components = DATESTAMP_REGEX.search(self.basename)
+        if components:
+            self.date = parse_datestamp(components.group())
+        if self.date:
+            self.year = self.date.year
+            self.has_time = bool(TIMESTAMP_SUFFIX_REGEX.match(self.basename, components.end()))
+
+    def __repr__(self):
+        return 'ArchiveItem(%r)' % self.path
+
+
+def parse_items(itemnames):
+    """returns a list of ArchiveItem for the item names"""
+
+    items = [ArchiveItem(itemname) for itemname in itemnames]
+    if options.metadata_dates:
+        add_metadata_dates(items)
+    return items
+
+
+def add_metadata_dates(items):
+    """sets the date of items (ArchiveItem) without a datestamp in their
+    name to the capture date of their metadata. Files are read in
+    parallel; the results are cached per path, size and mtime."""
+
+    files = []
+    for item in items:
+        if item.date:
+            continue
+        try:
+            item_stat = os.stat(item.path)
+        except OSError:
+            continue
+        if stat.S_ISREG(item_stat.st_mode):
+            files.append((item, item_stat.st_size, item_stat.st_mtime_ns))
+    if not files:
+        return
+
+    with measure_phase('metadata'):
+        dates = read_cached_metadata_dates(files)
+        unknown_files = [(item, size, mtime) for item, size, mtime in files if (item.path, size, mtime) not in dates]
+        if len(unknown_files) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=min(METADATA_WORKERS, len(unknown_files))) as executor:
+                read_dates = list(executor.map(read_metadata_date, (item.path for item, size, mtime in unknown_files)))
+        else:
+            read_dates = [read_metadata_date(item.path) for item, size, mtime in unknown_files]
+        new_dates = dict(((item.path, size, mtime), date) for (item, size, mtime), date in zip(unknown_files, read_dates))
+        write_cached_metadata_dates(new_dates)
+        dates.update(new_dates)
+
+    for item, size, mtime in files:
+        date = dates[(item.path, size, mtime)]
+        if date:
+            logging.debug('using date %s of the metadata of "%s"' % (date.isoformat()[:10], item.path))
+            item.date = date
+            item.year = date.year
+
+
+def open_metadata_cache():
+    """opens the cache of capture dates (and creates it if necessary)"""
+
+    import sqlite3
+    os.makedirs(os.path.dirname(METADATA_CACHE_FILE), exist_ok=True)
+    connection = sqlite3.connect(METADATA_CACHE_FILE, timeout=5)
+    with connection:
+        # date is NULL for files without a capture date:
+        connection.execute('CREATE TABLE IF NOT EXISTS metadata_dates ('
+                           'path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime INTEGER NOT NULL, date TEXT)')
+    return connection
+
+
+def read_cached_metadata_dates(files):
+    """returns the cached dates of files (list of (item, size, mtime)) as
+    dict of (path, size, mtime) -> datetime or None"""
+
+    import sqlite3
+    dates = {}
+    try:
+        connection = open_metadata_cache()
+        try:
+            for item, size, mtime in files:
+                path = os.path.abspath(item.path)
+                row = connection.execute('SELECT date FROM metadata_dates WHERE path = ? AND size = ? AND mtime = ?',
+                                         (path, size, mtime)).fetchone()
+                if row:
+                    dates[(item.path, size, mtime)] = row[0] and parse_datestamp(row[0])
+        finally:
+            connection.close()
+    except (OSError, sqlite3.Error) as detail:
+        logging.debug('can not read metadata cache "%s": %s' % (METADATA_CACHE_FILE, detail))
+    return dates
+
+
+def write_cached_metadata_dates(dates):
+    """stores dates (dict of (path, size, mtime) -> datetime or None) in
+    the cache (not in dryrun mode)"""
+
+    if options.dryrun or not dates:
+        return
+    import sqlite3
     try:
-        return datetime.strptime(components.group(), "%Y-%m-%d")
-    except (ValueError, AttributeError):
+        connection = open_metadata_cache()
+        try:
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO metadata_dates VALUES (?, ?, ?, ?)',
+                                       ((os.path.abspath(path), size, mtime, date and date.isoformat()[:10])
+                                        for (path, size, mtime), date in dates.items()))
+        finally:
+            connection.close()
+    except (OSError, sqlite3.Error) as detail:
+        logging.debug('can not write metadata cache "%s": %s' % (METADATA_CACHE_FILE, detail))
+
+
+def read_metadata_date(filename):
+    """returns the capture date (datetime) of an image or video or None.
+    Only the first METADATA_HEADER_SIZE bytes of images and the box
+    headers of videos are read, never the whole file."""
+
+    import struct
+    try:
+        with open(filename, 'rb') as mediafile:
+            header = mediafile.read(METADATA_HEADER_SIZE)
+            if header[:2] == b'\xff\xd8':
+                return get_exif_date_of_jpeg(header)
+            elif header[:4] in (b'II*\x00', b'MM\x00*'):
+                # TIFF and TIFF based raw images:
+                return get_exif_date(header)
+            elif header[4:8] in MP4_BOX_TYPES:
+                return get_mp4_date(mediafile)
+    except (OSError, struct.error, IndexError, ValueError, OverflowError) as detail:
+        # OverflowError: dates beyond the range of datetime
+        logging.debug('can not read the metadata of "%s": %s' % (filename, detail))
+    return None
+
+
+def get_exif_date_of_jpeg(header):
+    """returns the capture date of the EXIF segment within the header of a
+    JPEG file or None"""
+
+    import struct
+    offset = 2
+    while offset + 4 <= len(header) and header[offset] == 0xff:
+        marker = header[offset + 1]
+        (length,) = struct.unpack_from('>H', header, offset + 2)
+        if marker == 0xe1 and header[offset + 4:offset + 10] == b'Exif\x00\x00':
+            return get_exif_date(header[offset + 10:offset + 2 + length])
+        if marker == 0xda:
+            # start of the image data: no EXIF data
+            return None
+        offset += 2 + length
+    return None
+
+
+def get_exif_date(tiff):
+    """returns the capture date of EXIF data in TIFF structure
+    (DateTimeOriginal, DateTimeDigitized or DateTime) or None"""
+
+    import struct
+    if tiff[:2] == b'II':
+        byteorder = '<'
+    elif tiff[:2] == b'MM':
+        byteorder = '>'
+    else:
         return None
 
+    def read_ifd(offset):
+        (count,) = struct.unpack_from(byteorder + 'H', tiff, offset)
+        return dict((tag, value) for tag, value_type, value_count, value in
+                    (struct.unpack_from(byteorder + 'HHI4s', tiff, offset + 2 + 12 * index) for index in range(count)))
+
+    def read_date(ifd, tag):
+        if tag not in ifd:
+            return None
+        (offset,) = struct.unpack(byteorder + 'I', ifd[tag])
+        # "YYYY:MM:DD HH:MM:SS":
+        return parse_datestamp(tiff[offset:offset + 10].decode('ascii', 'replace').replace(':', '-'))
+
+    (ifd0_offset,) = struct.unpack_from(byteorder + 'I', tiff, 4)
+    ifd0 = read_ifd(ifd0_offset)
+    if 0x8769 in ifd0:
+        (exif_offset,) = struct.unpack(byteorder + 'I', ifd0[0x8769])
+        exif = read_ifd(exif_offset)
+        date = read_date(exif, 0x9003) or read_date(exif, 0x9004)
+        if date:
+            return date
+    return read_date(ifd0, 0x0132)
+
+
+def get_mp4_date(mp4file):
+    """returns the creation date of the movie header ("mvhd" box) of an
+    MP4/QuickTime video or None. Only box headers are read."""
+
+    import struct
+    filesize = os.fstat(mp4file.fileno()).st_size
+
+    def read_boxes(start, end):
+        """yields (type, start of content, end) of the boxes between start and end"""
+        offset = start
+        for index in range(METADATA_MAXIMUM_BOXES):
+            if offset + 8 > end:
+                return
+            mp4file.seek(offset)
+            size, box_type = struct.unpack('>I4s', mp4file.read(8))
+            content = offset + 8
+            if size == 1:
+                (size,) = struct.unpack('>Q', mp4file.read(8))
+                content += 8
+            elif size == 0:
+                size = end - offset
+            if size < content - offset:
+                return
+            yield box_type, content, offset + size
+            offset += size
+
+    for box_type, content, end in read_boxes(0, filesize):
+        if box_type != b'moov':
+            continue
+        for child_type, child_content, child_end in read_boxes(content, end):
+            if child_type != b'mvhd':
+                continue
+            mp4file.seek(child_content)
+            version = mp4file.read(4)[0]
+            if version == 1:
+                (creation_time,) = struct.unpack('>Q', mp4file.read(8))
+            else:
+                (creation_time,) = struct.unpack('>I', mp4file.read(4))
+            if not creation_time:
+                return None
+            # seconds since 1904-01-01 (UTC):
+            date = datetime(1904, 1, 1) + timedelta(seconds=creation_time)
+            return datetime(date.year, date.month, date.day)
+        return None
+    return None
+
 
-def extract_targetdirbasename_with_datestamp(targetdirbasename, args):
-    """extracts the full targetdirname including ISO datestamp"""
+def extract_targetdirbasename_with_datestamp(targetdirbasename, items):
+    """extracts the full targetdirname including ISO datestamp (from the first item with a datestamp)"""
 
     current_datestamp = extract_date(targetdirbasename)
     if current_datestamp:
@@ -218,23 +1167,22 @@ def extract_targetdirbasename_with_datestamp(targetdirbasename, args):
         first_datestamp = None
         logging.debug('targetdir "' + targetdirbasename + '" contains no datestamp. '
                       'Trying to extract one from the arguments ...')
-        for item in args:
-            itembasename = os.path.basename(item.strip())
-            current_datestamp = extract_date(itembasename)
+        for item in items:
+            current_datestamp = item.date
             if current_datestamp:
-                logging.debug('found datestamp "%s" in item "%s"' % (current_datestamp.isoformat()[:10], item.strip()))
+                logging.debug('found datestamp "%s" in item "%s"' % (current_datestamp.isoformat()[:10], item.path))
                 if first_datestamp:
                     logging.debug('comparing current datestamp "%s" with first datestamp' % current_datestamp.isoformat()[:10])
                     if current_datestamp != first_datestamp:
                         logging.warning('Datestamp of item "%s" differs from previously found datestamp "%s". '
-                                        'Taking previously found.' % (item.strip(), first_datestamp.isoformat()[:10]))
+                                        'Taking previously found.' % (item.path, first_datestamp.isoformat()[:10]))
                     else:
                         logging.debug("current datestamp is the same as the first one")
                 else:
                     logging.debug('setting first datestamp to "%s"' % current_datestamp.isoformat()[:10])
                     first_datestamp = current_datestamp
             else:
-                logging.warning('item "%s" has got no datestamp!' % item.strip())
+                logging.warning('item "%s" has got no datestamp!' % item.path)
 
         if first_datestamp:
             final_targetdir = first_datestamp.isoformat()[:10] + " " + targetdirbasename
@@ -247,16 +1195,12 @@ def extract_targetdirbasename_with_datestamp(targetdirbasename, args):
 
 
 def assert_each_item_has_datestamp(items):
-    """make sure that each item has a valid datestamp"""
+    """make sure that each item (ArchiveItem) has a valid datestamp"""
 
     logging.debug("checking each item for valid datestamp")
     for item in items:
-        components = re.search(DATESTAMP_REGEX, os.path.basename(item.strip()))
-        try:
-            item_date = datetime.strptime(components.group(), "%Y-%m-%d")
-            return item_date.year
-        except (ValueError, AttributeError):
-            error_exit(3, 'item "%s" has got no valid datestamp! Can not process this item.' % item)
+        if not item.date:
+            error_exit(3, 'item "%s" has got no valid datestamp! Can not process this item.' % item.path)
 
 
 def make_sure_targetdir_exists(archivepath, targetdir):
@@ -264,20 +1208,33 @@ def make_sure_targetdir_exists(archivepath, targetdir):
 
     logging.debug("make_sure_target_exists: archivepath [%s] targetdir [%s]" % (archivepath, targetdir))
     year = get_year_from_itemname(targetdir)
-    complete_target_path = os.path.join(str(archivepath), str(year), str(targetdir))
+    layout_directory = get_layout_directory(extract_date(targetdir), targetdir)
+    # existing event folders might be placed in a year folder before "--layout" was used:
+    existing_paths = [os.path.join(str(root.path), layout_directory, str(targetdir))
+                      for root in get_archive_roots(archivepath)]
+    existing_paths += [os.path.join(str(root.path), str(year), str(targetdir)) for root in get_archive_roots(archivepath)]
+    for complete_target_path in existing_paths:
+        if os.path.isdir(complete_target_path):
+            break
+    else:
+        archivepath = select_archive_root(archivepath, year)
+        complete_target_path = os.path.join(str(archivepath), layout_directory, str(targetdir))
+        make_sure_layout_directories_exist([os.path.dirname(complete_target_path)])
     global user_selected_suggested_directory
 
     if os.path.isdir(complete_target_path):
-        if options.append or user_selected_suggested_directory:
+        if options.append or options.cluster or user_selected_suggested_directory:
             logging.debug("target directory already exists. Appending files...")
         else:
             error_exit(4, "target directory already exists. Aborting.")
     else:
         if not options.dryrun:
             logging.info('creating target directory: "%s"' % complete_target_path)
-            os.mkdir(complete_target_path)
+            make_archive_directory(archivepath, complete_target_path)
         else:
             logging.info('creating target directory: "%s"' % complete_target_path)
+        # with "--dryrun", "--resume" creates it:
+        journal_move('mkdir', None, complete_target_path)
 
     return complete_target_path
 
@@ -293,31 +1250,123 @@ def make_sure_subdir_exists(currentdir, subdir):
     else:
         if not options.dryrun:
             logging.info('creating directory: "%s"' % complete_target_path)
-            os.mkdir(complete_target_path)
+            make_directory(complete_target_path)
         else:
             logging.info('creating directory: "%s"' % complete_target_path)
 
     return complete_target_path
 
 
+def check_layout(layout):
+    """raises ValueError if layout is no valid template for "--layout" """
+
+    if layout.split('/')[0] != '{year}':
+        raise ValueError('the layout has to start with the year folder "{year}"')
+    try:
+        directory = layout.format(year='2000', month='01', day='01', bucket='00')
+    except (KeyError, IndexError, ValueError) as detail:
+        raise ValueError('unknown field %s in "%s"' % (detail, layout))
+    if '' in directory.split('/') or '..' in directory.split('/') or '.' in directory.split('/'):
+        raise ValueError('"%s" has empty or relative directory names' % layout)
+
+
+def get_layout_directory(date, name):
+    """returns the directory of an item or event folder (relative to the
+    archive root) for its date and name according to "--layout" """
+
+    if options.layout == DEFAULT_LAYOUT:
+        return str(date.year)
+    bucket = ''
+    if '{bucket}' in options.layout:
+        import zlib
+        bucket = '%02x' % (zlib.crc32(name.encode('utf-8', 'surrogateescape')) & 0xff)
+    directory = options.layout.format(year=str(date.year), month='%02d' % date.month, day='%02d' % date.day,
+                                      bucket=bucket)
+    return os.path.join(*directory.split('/'))
+
+
+def is_layout_directory(relpath):
+    """returns true if relpath (relative to an archive root, separated by
+    "/") is a year folder or one of the folders below it which "--layout"
+    creates, e.g. "2023/2023-01-11" for "{year}/{year}-{month}-{day}" """
+
+    components = relpath.split('/')
+    layout_components = options.layout.split('/')
+    if len(components) > len(layout_components):
+        return False
+    for component, layout_component in zip(components, layout_components):
+        # re caches the compiled patterns:
+        if not re.match(get_layout_component_pattern(layout_component), component):
+            return False
+    return True
+
+
+def get_layout_component_pattern(layout_component):
+    """returns a regular expression matching the folder names of a
+    component of "--layout" like "{year}-{month}" """
+
+    import string
+    patterns = {'year': r'\d{4}', 'month': r'\d\d', 'day': r'\d\d', 'bucket': r'[0-9a-f]{2}'}
+    regex = ''
+    for literal, field, format_spec, conversion in string.Formatter().parse(layout_component):
+        regex += re.escape(literal)
+        if field is not None:
+            regex += patterns.get(field, '.*')
+    return '^' + regex + '$'
+
+
+def make_sure_layout_directories_exist(destinations):
+    """creates missing directories of "--layout" for the destination
+    directories. Only directories within existing year folders are
+    created; missing year folders are reported when executing the plan."""
+
+    if options.layout == DEFAULT_LAYOUT:
+        return
+
+    for destination in destinations:
+        missing_directories = []
+        directory = destination
+        while not os.path.isdir(directory) and os.path.dirname(directory) != directory:
+            missing_directories.append(directory)
+            directory = os.path.dirname(directory)
+        if not missing_directories:
+            continue
+
+        yearfolder = directory
+        while not YEARFOLDER_REGEX.match(os.path.basename(yearfolder)) and os.path.dirname(yearfolder) != yearfolder:
+            yearfolder = os.path.dirname(yearfolder)
+        if not YEARFOLDER_REGEX.match(os.path.basename(yearfolder)):
+            continue
+
+        for directory in reversed(missing_directories):
+            logging.info('creating directory: "%s"' % directory)
+            if not options.dryrun:
+                make_archive_directory(os.path.dirname(yearfolder), directory)
+            journal_move('mkdir', None, directory)
+
+
 def get_year_from_itemname(itemname):
     """extract year from item string"""
 
     # assert: main() makes sure that each item has datestamp!
-    components = re.search(DATESTAMP_REGEX, os.path.basename(itemname))
-    try:
-        return datetime.strptime(components.group(), "%Y-%m-%d").year
-    except (ValueError, AttributeError):
+    item_date = extract_date(itemname)
+    if item_date:
+        return item_date.year
+    else:
         error_exit(7, 'item "%s" should have a valid datestamp in it. '
                       'Should have been checked before, internal error :-(' % str(itemname))
 
 
 def pretty_print_move_item_information(item, destination):
-    """prints a nice screen output of item and target destination"""
+    """prints a nice screen output of item and target destination unless
+    "--quiet" is given"""
 
     assert(type(item) == str)
     assert(type(destination) == str)
 
+    if options.quiet:
+        return
+
     if len(item)+len(destination) < 80:
         in_between_linebreak = '\n'
     else:
@@ -335,108 +1384,1285 @@ def move_item(item, destination):
     pretty_print_move_item_information(item, destination)
 
     if not options.dryrun:
-        if os.path.isdir(destination):
-            basename = os.path.basename(item)
-            destinationfilename = os.path.join(destination, basename)
-            if os.path.isfile(destinationfilename):
-                logging.warning('Cannot move "%s" to "%s" because it already exists. Skipping.' % (item, destinationfilename))
-            else:
-                try:
-                    shutil.move(item, destination)
-                except IOError as detail:
-                    error_exit(5, 'Cannot move "%s" to "%s". Aborting.\n%s' % (item, destination, detail))
+        move_item_on_file_system(item, destination)
+
+
+def move_item_on_file_system(item, destination):
+    """moves an item to the destination directory without any screen
+    output. The destination and collisions are checked before by
+    preflight_move_plan()."""
+
+    destinationfilename = os.path.join(destination, os.path.basename(item))
+    if throttle:
+        throttle.wait_for_item()
+    try:
+        # shutil.move() would move the item into an existing directory:
+        if os.path.lexists(destinationfilename):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), destinationfilename)
+        shutil.move(item, destinationfilename, copy_function=copy_file)
+    except FileExistsError:
+        skip_existing_item(item, destinationfilename)
+        return
+    except (IOError, shutil.Error) as detail:
+        count_metric('failed items')
+        error_exit(5, 'Cannot move "%s" to "%s". Aborting.\n%s' % (item, destination, detail))
+    journal_move('done', item, destination)
+    count_moved_item(destinationfilename, 'copied')
+
+
+def skip_existing_item(item, destinationfilename):
+    """reports an item whose destination was created by another process
+    after preflight_move_plan() checked it"""
+
+    logging.warning('Cannot move "%s" to "%s" because it already exists. Skipping.' % (item, destinationfilename))
+    journal_move('skipped', item, os.path.dirname(destinationfilename))
+    count_metric('skipped items')
+
+
+class ChecksumMismatchError(OSError):
+    """raised if a copy does not have the checksum of its original"""
+
+
+def copy_file(source, destination):
+    """copies a file with its metadata; used by shutil.move() for moves
+    across devices. With "--verify", the original gets checksummed while
+    copying and the copy is read back and compared afterwards."""
+
+    with open(source, 'rb') as sourcefile:
+        # never replace an existing file (raises FileExistsError):
+        destinationfile = open(destination, 'xb')
+        try:
+            with destinationfile:
+                if options.verify:
+                    checksum = copy_file_data_with_checksum(sourcefile, destinationfile)
+                else:
+                    copy_file_data(sourcefile, destinationfile)
+        except OSError:
+            # do not leave an incomplete copy behind:
+            if os.path.isfile(destination):
+                os.remove(destination)
+            raise
+    shutil.copystat(source, destination)
+
+    if options.verify:
+        copy_checksum = get_file_checksum(destination)
+        if copy_checksum != checksum:
+            os.remove(destination)
+            raise ChecksumMismatchError(errno.EIO, 'checksum of the copy differs from the original ' +
+                                        '(%s instead of %s)' % (copy_checksum, checksum), source)
+        logging.debug('verified copy of "%s" (SHA-256 %s)' % (source, checksum))
+    return destination
+
+
+def copy_file_data(sourcefile, destinationfile):
+    """copies the content of a file using the fastest method available:
+    a reflink (a clone sharing the data), os.copy_file_range() or
+    os.sendfile() so that the data does not pass through user space, or
+    a plain buffered copy"""
+
+    if sys.platform.startswith('linux'):
+        import fcntl
+        try:
+            fcntl.ioctl(destinationfile.fileno(), FICLONE, sourcefile.fileno())
+            logging.debug('cloned "%s"' % sourcefile.name)
+            return
+        except OSError:
+            pass
+
+    for copy_function in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if not copy_function:
+            continue
+        try:
+            copy_with_system_call(copy_function, sourcefile, destinationfile)
+            return
+        except OSError as detail:
+            if detail.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+                                    errno.EBADF) or os.lseek(destinationfile.fileno(), 0, os.SEEK_CUR):
+                raise
+            # not supported for these files: try the next method
+
+    chunk_size = get_copy_chunk_size()
+    while True:
+        start = time.monotonic()
+        chunk = sourcefile.read(chunk_size)
+        if not chunk:
+            return
+        destinationfile.write(chunk)
+        if throttle:
+            throttle.copied(len(chunk), time.monotonic() - start)
+
+
+def get_copy_chunk_size():
+    """returns the number of bytes copied at once; smaller chunks are used
+    when copying is throttled to avoid bursts"""
+
+    if throttle and (throttle.bandwidth or throttle.backoff):
+        return THROTTLED_CHUNK_SIZE
+    return COPY_CHUNK_SIZE
+
+
+def copy_with_system_call(copy_function, sourcefile, destinationfile):
+    """copies sourcefile to destinationfile with os.copy_file_range() or
+    os.sendfile() until the end of sourcefile"""
+
+    sourcefd = sourcefile.fileno()
+    destinationfd = destinationfile.fileno()
+    chunk_size = get_copy_chunk_size()
+    while True:
+        start = time.monotonic()
+        if copy_function is os.sendfile:
+            copied = os.sendfile(destinationfd, sourcefd, None, chunk_size)
+        else:
+            copied = copy_function(sourcefd, destinationfd, chunk_size)
+        if copied == 0:
+            return
+        if throttle:
+            throttle.copied(copied, time.monotonic() - start)
+
+
+def copy_file_data_with_checksum(sourcefile, destinationfile):
+    """copies the content of a file and returns the SHA-256 checksum of
+    its data; the original is read only once"""
+
+    import hashlib
+    checksum = hashlib.sha256()
+    buffer = bytearray(get_copy_chunk_size())
+    view = memoryview(buffer)
+    while True:
+        start = time.monotonic()
+        length = sourcefile.readinto(buffer)
+        if not length:
+            break
+        checksum.update(view[:length])
+        destinationfile.write(view[:length])
+        if throttle:
+            throttle.copied(length, time.monotonic() - start)
+    destinationfile.flush()
+    os.fsync(destinationfile.fileno())
+    return checksum.hexdigest()
+
+
+def get_file_checksum(filename):
+    """returns the SHA-256 checksum of a file. The file is dropped from
+    the page cache first (where supported) so that the data on the
+    device gets checksummed."""
+
+    import hashlib
+    checksum = hashlib.sha256()
+    with open(filename, 'rb') as checkedfile:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(checkedfile.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        for chunk in iter(lambda: checkedfile.read(COPY_CHUNK_SIZE), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def get_renameat2():
+    """returns renameat2() of the C library (Linux) or None"""
+
+    global renameat2_function
+    if renameat2_function is None:
+        renameat2_function = False
+        if sys.platform.startswith('linux'):
+            import ctypes
+            import ctypes.util
+            try:
+                function = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True).renameat2
+                function.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+                renameat2_function = function
+            except (OSError, AttributeError):
+                logging.debug('renameat2() is not available')
+    return renameat2_function or None
+
+
+def rename_without_replacing(source, destination):
+    """renames source to destination and raises FileExistsError if
+    destination exists. Uses renameat2() with RENAME_NOREPLACE; where
+    this is not supported, files are hard linked and unlinked and
+    directories are renamed after checking the destination."""
+
+    renameat2 = get_renameat2()
+    if renameat2:
+        if renameat2(AT_FDCWD, os.fsencode(source), AT_FDCWD, os.fsencode(destination), RENAME_NOREPLACE) == 0:
+            return
+        import ctypes
+        errorcode = ctypes.get_errno()
+        if errorcode not in (errno.EINVAL, errno.ENOSYS):
+            raise OSError(errorcode, os.strerror(errorcode), source, None, destination)
+        # not supported by the file system
+
+    if not os.path.isdir(source) or os.path.islink(source):
+        try:
+            os.link(source, destination, follow_symlinks=False)
+        except FileExistsError:
+            raise
+        except OSError as detail:
+            if detail.errno == errno.EXDEV:
+                raise
+            logging.debug('can not link "%s": %s' % (source, detail))
         else:
-            error_exit(6, 'Destination directory "%s" does not exist! Aborting.' % destination)
+            os.unlink(source)
+            return
 
+    if os.path.lexists(destination):
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), destination)
+    os.rename(source, destination)
 
-def handle_item(itemname, archivepath, targetdir):
-    """handles one item and moves it to targetdir"""
 
-    logging.debug("--------------------------------------------")
-    logging.debug('processing item "%s"' % itemname)
-    logging.debug("with archivepath[%s]  and  targetdir[%s]" % (archivepath, targetdir))
+def rename_item(item, destinationfilename):
+    """moves an item to destinationfilename on the same file system
+    using one atomic rename. Falls back to shutil.move() if the file
+    system reports a cross-device move. Collisions are checked before
+    by preflight_move_plan()."""
+
+    if throttle:
+        throttle.wait_for_item()
+    try:
+        rename_without_replacing(item, destinationfilename)
+    except FileExistsError:
+        skip_existing_item(item, destinationfilename)
+        return
+    except OSError as detail:
+        if detail.errno != errno.EXDEV:
+            count_metric('failed items')
+            error_exit(5, 'Cannot move "%s" to "%s". Aborting.\n%s' % (item, destinationfilename, detail))
+        logging.debug('"%s" is not on the same device as "%s"; copying instead' % (item, destinationfilename))
+        move_item_on_file_system(item, os.path.dirname(destinationfilename))
+        return
+    journal_move('done', item, os.path.dirname(destinationfilename))
+    count_moved_item(destinationfilename, 'renamed')
+
 
-    if not os.path.exists(itemname):
-        logging.error('item "%s" does not exist! Ignoring.' % itemname)
-    elif targetdir:
+def get_destination_of_item(item, archivepath, targetdir):
+    """returns the destination directory for an item (ArchiveItem)"""
+
+    if targetdir:
         # targetdir option is given and this directory is created before
         # so just move items here:
-        move_item(itemname, targetdir)
+        return targetdir
     else:
         # find the correct <YYYY> subdirectory for each item:
-        year = get_year_from_itemname(itemname)
-        logging.debug('extracted year "%d" from item "%s"' % (year, itemname))
-        destination = os.path.join(archivepath, str(year))
-        move_item(itemname, destination)
+        if not item.year:
+            error_exit(7, 'item "%s" should have a valid datestamp in it. '
+                          'Should have been checked before, internal error :-(' % item.path)
+        logging.debug('extracted year "%d" from item "%s"' % (item.year, item.path))
+        return os.path.join(archivepath, get_layout_directory(item.date, item.basename))
+
+
+def plan_moves(items, archivepath, targetdir):
+    """determines the destination of each item (ArchiveItem) and groups
+    the item names by their destination directory and by being on the
+    same device as the destination or not.
+
+    @param return: ordered dict of (destination, same_device) -> list of item names
+    """
+
+    if options.duplicates:
+        items = remove_duplicate_items(items, archivepath)
+
+    roots_of_years = {}
+
+    def get_destination(item):
+        if not targetdir and item.year and item.year not in roots_of_years:
+            roots_of_years[item.year] = select_archive_root(archivepath, item.year)
+        return get_destination_of_item(item, roots_of_years.get(item.year, archivepath), targetdir)
+
+    with measure_phase('planning'):
+        moves = [(item.path, get_destination(item)) for item in items]
+        make_sure_layout_directories_exist(set(destination for itemname, destination in moves))
+        return group_moves(moves)
+
+
+def group_moves(moves):
+    """groups moves given as (item name, destination directory) like
+    plan_moves() does it. Not existing items are ignored.
+
+    @param return: ordered dict of (destination, same_device) -> list of item names
+    """
+
+    plan = collections.OrderedDict()
+    destination_devices = {}
+
+    for itemname, destination in moves:
+        logging.debug("--------------------------------------------")
+        logging.debug('planning item "%s"' % itemname)
+        try:
+            item_device = os.stat(itemname).st_dev
+        except OSError:
+            logging.error('item "%s" does not exist! Ignoring.' % itemname)
+            count_metric('missing items')
+            continue
+
+        if destination not in destination_devices:
+            try:
+                destination_devices[destination] = os.stat(destination).st_dev
+            except OSError:
+                # not existing (yet): handled when executing the plan
+                destination_devices[destination] = None
+
+        same_device = item_device == destination_devices[destination]
+        plan.setdefault((destination, same_device), []).append(itemname)
+
+    logging.debug("planned %i group(s) of moves" % len(plan))
+    return plan
+
+
+class DirectoryListingCache(object):
+    """names of the entries of destination directories. Each directory is
+    read only once using os.scandir() instead of checking each item with
+    its own stat() call which is a round trip on network file systems.
+    Names of planned moves are added so that later items with the same
+    name are detected as collisions as well."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def get_entries(self, directory):
+        """returns the set of names within directory or None if it is no directory"""
+
+        if directory not in self.entries:
+            try:
+                with os.scandir(directory) as entries:
+                    self.entries[directory] = set(entry.name for entry in entries)
+            except (FileNotFoundError, NotADirectoryError):
+                self.entries[directory] = None
+        return self.entries[directory]
+
+
+def preflight_move_plan(plan, listing_cache):
+    """checks all destination directories and all collisions of a plan
+    before anything is moved. Items whose name already exists in their
+    destination (as file, directory or link) or is used by a previous
+    item of the plan are skipped.
+
+    @param return: the plan without the skipped items
+    """
+
+    checked_plan = collections.OrderedDict()
+    for (destination, same_device), itemnames in plan.items():
+        entries = listing_cache.get_entries(destination)
+        if entries is None:
+            if not options.dryrun:
+                error_exit(6, 'Destination directory "%s" does not exist! Aborting.' % destination)
+            # not created in dryrun mode:
+            entries = listing_cache.entries[destination] = set()
+
+        checked_itemnames = []
+        for itemname in itemnames:
+            basename = os.path.basename(itemname)
+            if basename in entries:
+                logging.warning('Cannot move "%s" to "%s" because it already exists. Skipping.' %
+                                (itemname, os.path.join(destination, basename)))
+                journal_move('skipped', itemname, destination)
+                count_metric('skipped items')
+            else:
+                entries.add(basename)
+                checked_itemnames.append(itemname)
+        if checked_itemnames:
+            checked_plan[(destination, same_device)] = checked_itemnames
+
+    return checked_plan
+
+
+def execute_move_plan(plan, jobs=None, listing_cache=None):
+    """moves the items of a plan generated by plan_moves().
+
+    Destination directories and collisions are checked for all items
+    before anything is moved. Items on the same device as their
+    destination are renamed; the remaining items are copied and deleted
+    using up to jobs worker threads (DEFAULT: the "--jobs" option).
+
+    Pass the same DirectoryListingCache when executing several plans
+    with the same destinations within a short time."""
+
+    if jobs is None:
+        jobs = options.jobs
+    if listing_cache is None:
+        listing_cache = DirectoryListingCache()
+
+    if journal:
+        journal.record_plan(plan)
+
+    with lock_directories(destination for destination, same_device in plan.keys()):
+        with measure_phase('preflight'):
+            plan = preflight_move_plan(plan, listing_cache)
+
+        with measure_phase('moves'):
+            execute_move_plan_groups(plan, jobs)
+
+
+@contextlib.contextmanager
+def lock_directories(directories):
+    """holds advisory locks (flock) of directories so that concurrent
+    runs of move2archive check and move items into the same directory
+    one after another. The directories are locked in sorted order to
+    avoid deadlocks; missing directories are not locked (they are
+    reported by preflight_move_plan()). Not available on Windows and on
+    file systems without flock() for directories like NFS."""
+
+    if options.dryrun or sys.platform == 'win32':
+        yield
+        return
+
+    import fcntl
+    descriptors = []
+    try:
+        with measure_phase('locking'):
+            for directory in sorted(set(directories)):
+                try:
+                    descriptor = os.open(directory, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+                except OSError:
+                    continue
+                descriptors.append(descriptor)
+                try:
+                    try:
+                        fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        logging.info('waiting for another process moving items to "%s" ...' % directory)
+                        fcntl.flock(descriptor, fcntl.LOCK_EX)
+                except OSError as detail:
+                    # e.g. NFS emulates flock() with byte-range locks which need a file opened for writing:
+                    if detail.errno not in (errno.EBADF, errno.ENOLCK, errno.EOPNOTSUPP):
+                        raise
+                    logging.warning('Cannot lock "%s" (%s); moving without lock. Existing items are not '
+                                    'overwritten anyway.' % (directory, detail.strerror))
+        yield
+    finally:
+        # closing releases the locks:
+        for descriptor in descriptors:
+            os.close(descriptor)
+
+
+def execute_move_plan_groups(plan, jobs):
+    """moves the items of each group of a plan. Items on the same device
+    as their destination are renamed first. Groups which have to be
+    copied to different devices (e.g. archive roots on several disks)
+    are moved at the same time, one thread per destination device."""
+
+    groups_of_devices = collections.OrderedDict()
+    for (destination, same_device), itemnames in plan.items():
+        if options.dryrun:
+            for itemname in itemnames:
+                pretty_print_move_item_information(itemname, destination)
+            continue
+
+        if same_device:
+            logging.debug('renaming %i item(s) to "%s"' % (len(itemnames), destination))
+            for itemname in itemnames:
+                pretty_print_move_item_information(itemname, destination)
+                rename_item(itemname, os.path.join(destination, os.path.basename(itemname)))
+        else:
+            groups_of_devices.setdefault(os.stat(destination).st_dev, []).append((destination, itemnames))
+
+    if len(groups_of_devices) < 2:
+        for groups in groups_of_devices.values():
+            move_groups_across_devices(groups, jobs)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+    logging.debug('moving items to %i devices at the same time' % len(groups_of_devices))
+    with ThreadPoolExecutor(max_workers=len(groups_of_devices)) as executor:
+        for future in [executor.submit(move_groups_across_devices, groups, jobs)
+                       for groups in groups_of_devices.values()]:
+            future.result()
+
+
+def move_groups_across_devices(groups, jobs):
+    """moves groups of (destination, item names) across devices"""
+
+    for destination, itemnames in groups:
+        logging.debug('moving %i item(s) across devices to "%s"' % (len(itemnames), destination))
+        move_items_across_devices(itemnames, destination, jobs)
+
+
+def move_items_across_devices(itemnames, destination, jobs):
+    """moves items to a destination directory on a different device using
+    a pool of jobs worker threads.
+
+    Screen output is printed in the order of the items while the moves
+    themselves run concurrently. This pays off when the archive is
+    located on a different file system where each move is a copy."""
+
+    if jobs < 2:
+        for itemname in itemnames:
+            move_item(itemname, destination)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+    pending_moves = collections.deque()
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        for itemname in itemnames:
+            # preflight_move_plan() made sure that no two items have the same destination:
+            pretty_print_move_item_information(itemname, destination)
+            pending_moves.append(executor.submit(move_item_on_file_system, itemname, destination))
+
+            # limit the number of queued moves and get errors (error_exit) early:
+            while len(pending_moves) > 2 * jobs:
+                pending_moves.popleft().result()
+
+        while pending_moves:
+            pending_moves.popleft().result()
+    finally:
+        # on errors, do not start any further moves:
+        executor.shutdown(wait=True, cancel_futures=True)
 
 
-def generate_absolute_target_dir(targetdir, args, archivepath):
+def handle_item(itemname, archivepath, targetdir):
+    """handles one item and moves it to targetdir"""
+
+    logging.debug("with archivepath[%s]  and  targetdir[%s]" % (archivepath, targetdir))
+    execute_move_plan(plan_moves(parse_items([itemname]), archivepath, targetdir))
+
+
+def generate_absolute_target_dir(targetdir, items, archivepath):
     """returns existing target directory containing a datestamp"""
 
     logging.debug("trying to find a target dir with datestamp")
-    targetdirname = extract_targetdirbasename_with_datestamp(targetdir, args)
+    targetdirname = extract_targetdirbasename_with_datestamp(targetdir, items)
     logging.debug('extract_targetdirbasename... returned "%s"' % targetdirname)
     return make_sure_targetdir_exists(archivepath, targetdirname)
 
 
-def get_potential_target_directories(args, archivepath):
-    """takes first argument, extracts its date-stamp, looks for existing
-    directories starting with the time-stamp (or similar) and returns the
-    list of the directories."""
+def open_archive_index(archivepath):
+    """opens the index of the directories within the year folders of
+    archivepath. The index is created if it does not exist yet. When
+    running in dryrun mode or when the index file can not be written,
+    an empty index in memory is used instead.
 
-    firstfile = args[0]
+    @param return: sqlite3 connection
+    """
 
-    if not os.path.exists(firstfile):
-        error_exit(11, 'File/Folder "%s" does not exist! Aborting.' % firstfile)
+    import sqlite3
+    indexfile = os.path.join(archivepath, ARCHIVE_INDEX_FILENAME)
+    if options.dryrun:
+        indexfile = ':memory:'
 
-    firstfile = os.path.basename(firstfile)
-    assert_each_item_has_datestamp([firstfile])
+    try:
+        connection = sqlite3.connect(indexfile, timeout=30)
+        create_archive_index_tables(connection)
+    except sqlite3.Error as detail:
+        logging.debug('can not use archive index "%s" (%s); using a temporary one' % (indexfile, detail))
+        connection = sqlite3.connect(':memory:')
+        create_archive_index_tables(connection)
+
+    return connection
+
+
+def create_archive_index_tables(connection):
+    """creates the tables of the archive index if they do not exist.
+
+    Each directory is stored with its path relative to the archivepath.
+    The mtime of a directory is set once its sub-directories are stored;
+    it is -1 for symbolic links which are not descended into."""
+
+    with connection:
+        connection.execute('CREATE TABLE IF NOT EXISTS directories ('
+                           'path TEXT PRIMARY KEY, parent TEXT NOT NULL, name TEXT NOT NULL, '
+                           'datestamp TEXT, mtime INTEGER)')
+        connection.execute('CREATE INDEX IF NOT EXISTS directories_by_parent ON directories (parent)')
+        connection.execute('CREATE INDEX IF NOT EXISTS directories_by_datestamp ON directories (datestamp)')
+        # files of the directories for "--duplicates"; hashes are added when needed:
+        connection.execute('CREATE TABLE IF NOT EXISTS files ('
+                           'path TEXT PRIMARY KEY, directory TEXT NOT NULL, size INTEGER NOT NULL, '
+                           'mtime INTEGER NOT NULL, partial_hash TEXT, full_hash TEXT)')
+        connection.execute('CREATE INDEX IF NOT EXISTS files_by_size ON files (size)')
+        connection.execute('CREATE INDEX IF NOT EXISTS files_by_directory ON files (directory)')
+        # mtime of each directory when its files were stored:
+        connection.execute('CREATE TABLE IF NOT EXISTS file_directories (path TEXT PRIMARY KEY, mtime INTEGER)')
+        # datestamped directories for "--name-suggestions", kept in sync by triggers; "indexed" is
+        # set once the trigrams of the words of their names are in name_trigrams:
+        connection.execute('CREATE TABLE IF NOT EXISTS names ('
+                           'id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, indexed INTEGER NOT NULL DEFAULT 0)')
+        connection.execute('CREATE INDEX IF NOT EXISTS unindexed_names ON names (id) WHERE indexed = 0')
+        connection.execute('CREATE TABLE IF NOT EXISTS name_trigrams ('
+                           'trigram TEXT NOT NULL, datestamp TEXT NOT NULL, id INTEGER NOT NULL, '
+                           'PRIMARY KEY (trigram, datestamp, id)) WITHOUT ROWID')
+        connection.execute('CREATE INDEX IF NOT EXISTS name_trigrams_by_id ON name_trigrams (id)')
+        connection.execute('CREATE TABLE IF NOT EXISTS name_trigram_frequencies ('
+                           'trigram TEXT PRIMARY KEY, frequency INTEGER NOT NULL) WITHOUT ROWID')
+        connection.execute('CREATE TRIGGER IF NOT EXISTS name_trigrams_delete AFTER DELETE ON name_trigrams BEGIN '
+                           'UPDATE name_trigram_frequencies SET frequency = frequency - 1 '
+                           'WHERE trigram = OLD.trigram; END')
+        new_name_index = not connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND "
+                                                "name = 'directories_insert_name'").fetchone()
+        connection.execute('CREATE TRIGGER IF NOT EXISTS directories_insert_name AFTER INSERT ON directories '
+                           'WHEN NEW.datestamp IS NOT NULL BEGIN '
+                           'INSERT OR IGNORE INTO names (path) VALUES (NEW.path); END')
+        connection.execute('CREATE TRIGGER IF NOT EXISTS directories_delete_name AFTER DELETE ON directories BEGIN '
+                           'DELETE FROM name_trigrams WHERE id = (SELECT id FROM names WHERE path = OLD.path); '
+                           'DELETE FROM names WHERE path = OLD.path; END')
+        if new_name_index:
+            # directories indexed before the names were:
+            connection.execute('INSERT OR IGNORE INTO names (path) SELECT path FROM directories WHERE datestamp IS NOT NULL')
+
+
+def get_datestamp_of_directoryname(name):
+    """returns the datestamp a directory name starts with or None"""
+
+    if DATESTAMP_REGEX.match(name):
+        return name[:10]
+    return None
+
+
+def get_datestamp_of_indexed_directory(relpath):
+    """returns the datestamp of a directory of the archive index (path
+    relative to the archive root) or None. Folders of "--layout" like
+    "2023/2023-01-11" are no event folders and have none."""
+
+    if is_layout_directory(relpath):
+        return None
+    return get_datestamp_of_directoryname(relpath.split('/')[-1])
+
+
+def remove_directory_from_archive_index(connection, relpath):
+    """removes a directory and all of its sub-directories from the index"""
+
+    # all paths starting with "relpath/" sort between "relpath/" and "relpath0":
+    connection.execute('DELETE FROM directories WHERE path = ? OR (path >= ? AND path < ?)',
+                       (relpath, relpath + '/', relpath + chr(ord('/') + 1)))
+
+
+def update_archive_index(connection, archivepath, yearfolder):
+    """brings the index entries of one year folder up to date.
+
+    Directories whose mtime did not change since the last update are
+    only stat'ed; their known sub-directories are taken from the index.
+    All other directories are listed again."""
+
+    with connection:
+        connection.execute('INSERT OR IGNORE INTO directories VALUES (?, ?, ?, NULL, NULL)',
+                           (yearfolder, '', yearfolder))
+        directories_to_check = [yearfolder]
+        while directories_to_check:
+            relpath = directories_to_check.pop()
+            try:
+                mtime = os.stat(os.path.join(archivepath, relpath)).st_mtime_ns
+            except OSError:
+                remove_directory_from_archive_index(connection, relpath)
+                continue
+
+            (indexed_mtime,) = connection.execute('SELECT mtime FROM directories WHERE path = ?', (relpath,)).fetchone()
+            indexed_subdirectories = dict(connection.execute('SELECT path, mtime FROM directories WHERE parent = ?',
+                                                             (relpath,)).fetchall())
+            if indexed_mtime == mtime:
+                directories_to_check.extend(subdirectory for subdirectory, subdirectory_mtime in indexed_subdirectories.items()
+                                            if subdirectory_mtime != -1)
+                continue
+
+            logging.debug('listing changed directory "%s" for the archive index' % relpath)
+            subdirectories = {}
+            with os.scandir(os.path.join(archivepath, relpath)) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        subdirectories[relpath + '/' + entry.name] = entry
+
+            for subdirectory in indexed_subdirectories.keys() - subdirectories.keys():
+                remove_directory_from_archive_index(connection, subdirectory)
+            for subdirectory, entry in subdirectories.items():
+                if subdirectory not in indexed_subdirectories:
+                    connection.execute('INSERT INTO directories VALUES (?, ?, ?, ?, ?)',
+                                       (subdirectory, relpath, entry.name,
+                                        get_datestamp_of_indexed_directory(subdirectory),
+                                        -1 if entry.is_symlink() else None))
+                if not entry.is_symlink():
+                    directories_to_check.append(subdirectory)
+            connection.execute('UPDATE directories SET mtime = ? WHERE path = ?', (mtime, relpath))
+
+
+def query_archive_index(connection, first_date, last_date):
+    """returns the names of indexed directories starting with a datestamp
+    between first_date and last_date (inclusive)"""
+
+    # layout folders might be indexed by runs with another "--layout":
+    return [name for (path, name) in connection.execute('SELECT path, name FROM directories '
+                                                        'WHERE datestamp BETWEEN ? AND ? ORDER BY datestamp, name',
+                                                        (first_date.isoformat()[:10], last_date.isoformat()[:10]))
+            if not is_layout_directory(path)]
+
+
+def get_trigrams(words):
+    """returns the set of trigrams of words, each padded with a space
+    at both ends, e.g. " we", "wed", ..., "ng " of "wedding" """
+
+    trigrams = set()
+    for word in words:
+        padded = ' ' + word + ' '
+        trigrams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return trigrams
+
+
+def update_name_index(connection):
+    """adds the trigrams of the names of the directories which were added
+    to the archive index since the last update"""
+
+    with connection:
+        # take the write lock before reading so that names added by a concurrent run meanwhile
+        # are not marked as indexed below:
+        connection.execute('BEGIN IMMEDIATE')
+        rows = connection.execute('SELECT id, name, datestamp FROM names JOIN directories USING (path) '
+                                  'WHERE indexed = 0').fetchall()
+        if not rows:
+            return
+        logging.debug('adding %i folder name(s) to the name index' % len(rows))
+        postings = [(trigram, datestamp, identifier) for identifier, name, datestamp in rows
+                    for trigram in get_trigrams(get_name_words(name))]
+        connection.executemany('INSERT INTO name_trigrams VALUES (?, ?, ?)', postings)
+        connection.executemany('INSERT INTO name_trigram_frequencies VALUES (?, ?) ON CONFLICT (trigram) '
+                               'DO UPDATE SET frequency = frequency + excluded.frequency',
+                               collections.Counter(trigram for trigram, datestamp, identifier in postings).items())
+        connection.execute('UPDATE names SET indexed = 1 WHERE indexed = 0')
+
+
+def query_name_index(connection, words, date, count):
+    """returns up to count tuples (score, path, name) of the indexed
+    directories with names similar to words, best first. The similarity
+    is the share of common trigrams; it is divided by the distance of
+    the datestamp of the directory to date in NAME_SUGGESTION_HALF_SCORE_DAYS
+    (plus one).
+
+    Only the NAME_SUGGESTION_CANDIDATES directories sharing the most
+    trigrams are scored. As the entries of each trigram are sorted by
+    datestamp, trigrams which are too common to be searched in all
+    folder names are searched near date only; this keeps the time of a
+    query independent of the size of the archive."""
+
+    trigrams = get_trigrams(words)
+    if not trigrams:
+        return []
+    frequencies = connection.execute('SELECT trigram, frequency FROM name_trigram_frequencies '
+                                     'WHERE trigram IN (%s) AND frequency > 0 ORDER BY frequency' %
+                                     ', '.join('?' * len(trigrams)), list(trigrams)).fetchall()
+    if not frequencies:
+        return []
+    rare_trigrams = []
+    postings = 0
+    for trigram, frequency in frequencies:
+        if postings + frequency > NAME_INDEX_MAXIMUM_POSTINGS:
+            break
+        rare_trigrams.append(trigram)
+        postings += frequency
+    common_trigrams = [trigram for trigram, frequency in frequencies[len(rare_trigrams):]]
+
+    # the days around date in which the common trigrams are expected to
+    # have the remaining number of entries:
+    window = timedelta(0)
+    if common_trigrams:
+        first_date = parse_datestamp(connection.execute('SELECT MIN(datestamp) FROM directories').fetchone()[0] or '')
+        last_date = parse_datestamp(connection.execute('SELECT MAX(datestamp) FROM directories').fetchone()[0] or '')
+        if first_date and last_date:
+            days = (last_date - first_date).days + 1
+            common_postings = sum(frequency for trigram, frequency in frequencies[len(rare_trigrams):])
+            window = timedelta(days=(NAME_INDEX_MAXIMUM_POSTINGS - postings) * days // common_postings // 2)
+        logging.debug('searching %i common trigram(s) within %i days' % (len(common_trigrams), window.days))
+
+    # separate queries for both kinds of trigrams so that each uses the primary key:
+    queries = []
+    parameters = []
+    if rare_trigrams:
+        queries.append('SELECT id FROM name_trigrams WHERE trigram IN (%s)' % ', '.join('?' * len(rare_trigrams)))
+        parameters += rare_trigrams
+    if common_trigrams:
+        queries.append('SELECT id FROM name_trigrams WHERE trigram IN (%s) AND datestamp BETWEEN ? AND ?' %
+                       ', '.join('?' * len(common_trigrams)))
+        parameters += common_trigrams + [(date - window).isoformat()[:10], (date + window).isoformat()[:10]]
+    candidates = connection.execute('SELECT path, name, directories.datestamp FROM ('
+                                    'SELECT id, COUNT(*) AS shared FROM (%s) GROUP BY id ORDER BY shared DESC LIMIT ?) '
+                                    'JOIN names USING (id) JOIN directories USING (path)' % ' UNION ALL '.join(queries),
+                                    parameters + [NAME_SUGGESTION_CANDIDATES]).fetchall()
+    matches = []
+    for path, name, datestamp in candidates:
+        if is_layout_directory(path):
+            continue
+        name_trigrams = get_trigrams(get_name_words(name))
+        similarity = len(trigrams & name_trigrams) / len(trigrams | name_trigrams)
+        directory_date = parse_datestamp(datestamp)
+        if similarity < NAME_SUGGESTION_MINIMUM_SIMILARITY or not directory_date:
+            continue
+        days = abs((directory_date.date() - date.date()).days)
+        matches.append((similarity / (1 + days / NAME_SUGGESTION_HALF_SCORE_DAYS), path, name))
+    matches.sort(reverse=True)
+    return matches[:count]
+
+
+def make_directory(directory):
+    """creates a directory; a directory created by a concurrent process
+    meanwhile is fine as well"""
 
-    item_date = extract_date(firstfile)
-    yearfolder = os.path.join(archivepath, str(item_date.year))
-    if not os.path.exists(yearfolder):
-        new_year = str(os.path.join(archivepath, yearfolder))
+    try:
+        os.mkdir(directory)
+    except FileExistsError:
+        if not os.path.isdir(directory):
+            raise
+        logging.debug('directory "%s" was created by another process meanwhile' % directory)
+
+
+def make_archive_directory(archivepath, directory):
+    """creates a directory within archivepath and adds it to the archive
+    index so that the next update does not need to list its parent again."""
+
+    parent = os.path.dirname(directory)
+    parent_mtime_before = os.stat(parent).st_mtime_ns
+    with measure_phase('directory creation'):
+        make_directory(directory)
+
+    import sqlite3
+    relpath = os.path.relpath(directory, archivepath).replace(os.sep, '/')
+    relparent = os.path.dirname(relpath)
+    connection = open_archive_index(archivepath)
+    try:
+        with connection:
+            connection.execute('INSERT OR IGNORE INTO directories VALUES (?, ?, ?, ?, NULL)',
+                               (relpath, relparent, os.path.basename(relpath),
+                                get_datestamp_of_indexed_directory(relpath)))
+            # only skip listing the parent again if nobody else changed it meanwhile:
+            connection.execute('UPDATE directories SET mtime = ? WHERE path = ? AND mtime = ?',
+                               (os.stat(parent).st_mtime_ns, relparent, parent_mtime_before))
+    except sqlite3.Error as detail:
+        logging.debug('could not add "%s" to the archive index: %s' % (relpath, detail))
+    finally:
+        connection.close()
+
+
+def get_archive_folder_basenames(archivepath):
+    """returns the names of the datestamped folders in the archive indexes
+    of all archive roots without their datestamps, e.g. "Wedding of Paula
+    and John" """
+
+    names = []
+    for root in get_archive_roots(archivepath):
+        connection = open_archive_index(root.path)
+        try:
+            names.extend(connection.execute('SELECT DISTINCT name FROM directories '
+                                            'WHERE datestamp IS NOT NULL').fetchall())
+        finally:
+            connection.close()
+
+    basenames = set()
+    for (name,) in names:
+        basename = FOLDERNAME_DATESTAMP_PREFIX_REGEX.sub('', name, count=1).strip()
+        if basename:
+            basenames.add(basename)
+    logging.debug("found %i folder names in the archive index" % len(basenames))
+    return basenames
+
+
+def get_potential_target_directories(items, archivepath):
+    """takes first item (ArchiveItem), looks for existing directories
+    starting with its date-stamp (or within the range of days given by
+    --suggestion-range) and returns the list of the directories."""
+
+    if not os.path.exists(items[0].path):
+        error_exit(11, 'File/Folder "%s" does not exist! Aborting.' % items[0].path)
+
+    firstfile = items[0].basename
+    assert_each_item_has_datestamp(items[:1])
+
+    item_date = items[0].date
+    roots = get_archive_roots(archivepath)
+    if not options.dryrun and not any(os.path.exists(os.path.join(root.path, str(item_date.year))) for root in roots):
+        # with "--dryrun", a missing year folder just has no directories to suggest
+        yearroot = select_archive_root(archivepath, item_date.year)
+        new_year = os.path.join(yearroot, str(item_date.year))
         try:
-            os.mkdir(new_year)
+            make_archive_directory(yearroot, new_year)
         except IOError:
             print('The creation of new folder "%s" failed.' % new_year)
             sys.exit()
 
     # existing yearfolder found; looking for matching subfolders:
-    logging.debug("looking for potential existing target folders for file \"%s\" in folder \"%s\"" % (firstfile, yearfolder))
-    datestamp = firstfile[0:10]
-    pattern = datestamp + '*'
-    directory_suggestions = []
+    logging.debug("looking for potential existing target folders for file \"%s\" in %i archive root(s)" %
+                  (firstfile, len(roots)))
+    first_date = item_date - timedelta(days=options.suggestion_range)
+    last_date = item_date + timedelta(days=options.suggestion_range)
 
-    for root, dirs, files in os.walk(yearfolder):
-        for directory in fnmatch.filter(dirs, pattern):
-            logging.debug("found matching folder \"%s\"" % (directory))
-            directory_suggestions.append(directory)
+    directory_suggestions = []
+    for root in roots:
+        connection = open_archive_index(root.path)
+        try:
+            for year in range(first_date.year, last_date.year + 1):
+                if os.path.isdir(os.path.join(root.path, str(year))):
+                    update_archive_index(connection, root.path, str(year))
+            directory_suggestions.extend(query_archive_index(connection, first_date, last_date))
+        finally:
+            connection.close()
+    if len(roots) > 1:
+        directory_suggestions = sorted(set(directory_suggestions),
+                                       key=lambda name: (get_datestamp_of_directoryname(name) or '', name))
+
+    for directory in directory_suggestions:
+        logging.debug("found matching folder \"%s\"" % (directory))
     logging.debug("found %i potential directory suggestions" % (len(directory_suggestions)))
 
     return directory_suggestions
 
 
+def get_common_name_words(items):
+    """returns the words (see get_name_components()) which the names of
+    more than half of the items (ArchiveItem) contain. For more than
+    GUESS_SAMPLE_SIZE items, an evenly spread sample is analyzed."""
+
+    if len(items) > GUESS_SAMPLE_SIZE:
+        items = [items[index * len(items) // GUESS_SAMPLE_SIZE] for index in range(GUESS_SAMPLE_SIZE)]
+    counts = collections.Counter(word for item in items for word in get_name_components(item))
+    return sorted(word for word, count in counts.items() if 2 * count > len(items))
+
+
+def get_name_matching_directories(items, archivepath, known_directories):
+    """returns the names of up to "--name-suggestions" existing directories
+    of all archive roots with names similar to the common words of the
+    items (ArchiveItem), no matter how far their dates are away from the
+    first item (see query_name_index()). The known_directories are left
+    out.
+
+    Only the year folders which changed are brought up to date in the
+    archive index first (see update_archive_index_of_changed_years());
+    the years of the items are updated by get_potential_target_directories()."""
+
+    if not options.name_suggestions:
+        return []
+    words = get_common_name_words(items)
+    if not words:
+        return []
+    logging.debug('looking for folders with names similar to %s' % ', '.join(words))
+
+    import sqlite3
+    item_date = items[0].date
+    matches = []
+    for root in get_archive_roots(archivepath):
+        connection = open_archive_index(root.path)
+        try:
+            update_archive_index_of_changed_years(connection, root.path)
+            update_name_index(connection)
+            matches.extend((score, root.path, path, name) for score, path, name in
+                           query_name_index(connection, words, item_date,
+                                            options.name_suggestions + len(known_directories)))
+        except sqlite3.Error as detail:
+            # e.g. updated by another process at the same time; suggestions by name are optional:
+            logging.debug('can not use the name index of "%s": %s' % (root.path, detail))
+        finally:
+            connection.close()
+
+    suggestions = []
+    for score, rootpath, path, name in sorted(matches, reverse=True):
+        if name in known_directories or name in suggestions:
+            continue
+        if not os.path.isdir(os.path.join(rootpath, path)):
+            # removed in a year folder which was not updated
+            continue
+        logging.debug('found folder "%s" with a similar name (score %.2f)' % (name, score))
+        suggestions.append(name)
+        if len(suggestions) == options.name_suggestions:
+            break
+    return suggestions
+
+
+def update_archive_index_of_all_years(connection, archivepath):
+    """brings the index entries of all year folders of archivepath up to
+    date (see update_archive_index())"""
+
+    with os.scandir(archivepath) as entries:
+        yearfolders = [entry.name for entry in entries if YEARFOLDER_REGEX.match(entry.name) and entry.is_dir()]
+    for yearfolder in yearfolders:
+        update_archive_index(connection, archivepath, yearfolder)
+
+
+def update_archive_index_of_changed_years(connection, archivepath):
+    """brings the index entries of those year folders of archivepath up to
+    date which are not indexed yet or whose mtime changed, i.e. which got
+    directories added or removed directly within; only the year folders
+    themselves are stat'ed. Changes deeper within the other year folders
+    are found with the next update of their year (see update_archive_index())."""
+
+    indexed_mtimes = dict(connection.execute("SELECT path, mtime FROM directories WHERE parent = ''").fetchall())
+    with os.scandir(archivepath) as entries:
+        yearfolders = [entry for entry in entries if YEARFOLDER_REGEX.match(entry.name) and entry.is_dir()]
+    for entry in yearfolders:
+        if indexed_mtimes.get(entry.name) != entry.stat().st_mtime_ns:
+            update_archive_index(connection, archivepath, entry.name)
+    with connection:
+        for yearfolder in indexed_mtimes.keys() - set(entry.name for entry in yearfolders):
+            remove_directory_from_archive_index(connection, yearfolder)
+
+
+def update_file_index(connection, archivepath):
+    """brings the directories of all year folders of archivepath and
+    their files in the archive index up to date. Only the files of
+    directories which changed since the last update are listed again."""
+
+    update_archive_index_of_all_years(connection, archivepath)
+
+    with connection:
+        changed_directories = connection.execute(
+            'SELECT directories.path, directories.mtime FROM directories '
+            'LEFT JOIN file_directories ON directories.path = file_directories.path '
+            'WHERE directories.mtime IS NOT NULL AND directories.mtime != -1 AND '
+            '(file_directories.mtime IS NULL OR file_directories.mtime != directories.mtime)').fetchall()
+        for relpath, mtime in changed_directories:
+            logging.debug('listing files of changed directory "%s" for the archive index' % relpath)
+            files = {}
+            try:
+                with os.scandir(os.path.join(archivepath, relpath)) as entries:
+                    for entry in entries:
+                        if entry.is_file(follow_symlinks=False):
+                            entry_stat = entry.stat(follow_symlinks=False)
+                            files[relpath + '/' + entry.name] = (entry_stat.st_size, entry_stat.st_mtime_ns)
+            except OSError:
+                continue
+
+            indexed_files = dict(((path, (size, mtime)) for path, size, mtime in connection.execute(
+                'SELECT path, size, mtime FROM files WHERE directory = ?', (relpath,))))
+            for path in indexed_files.keys() - files.keys():
+                connection.execute('DELETE FROM files WHERE path = ?', (path,))
+            for path, (size, file_mtime) in files.items():
+                if indexed_files.get(path) != (size, file_mtime):
+                    connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, NULL, NULL)',
+                                       (path, relpath, size, file_mtime))
+            connection.execute('INSERT OR REPLACE INTO file_directories VALUES (?, ?)', (relpath, mtime))
+
+        if changed_directories:
+            connection.execute('DELETE FROM files WHERE directory NOT IN (SELECT path FROM directories)')
+            connection.execute('DELETE FROM file_directories WHERE path NOT IN (SELECT path FROM directories)')
+
+
+def get_partial_hash(filename, size):
+    """returns the SHA-256 checksum of the first and the last
+    PARTIAL_HASH_SIZE bytes of a file"""
+
+    import hashlib
+    checksum = hashlib.sha256()
+    with open(filename, 'rb') as hashedfile:
+        checksum.update(hashedfile.read(PARTIAL_HASH_SIZE))
+        if size > PARTIAL_HASH_SIZE:
+            hashedfile.seek(max(PARTIAL_HASH_SIZE, size - PARTIAL_HASH_SIZE))
+            checksum.update(hashedfile.read(PARTIAL_HASH_SIZE))
+    return checksum.hexdigest()
+
+
+def get_full_hash(filename):
+    """returns the SHA-256 checksum of a file"""
+
+    import hashlib
+    checksum = hashlib.sha256()
+    with open(filename, 'rb') as hashedfile:
+        for chunk in iter(lambda: hashedfile.read(COPY_CHUNK_SIZE), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+class HashedFile(object):
+    """a file whose hashes are computed when they are needed first. Files
+    of the archive index (connection and relpath given) store computed
+    hashes in the index."""
+
+    __slots__ = ('path', 'size', 'mtime', 'partial_hash', 'full_hash', 'connection', 'relpath')
+
+    def __init__(self, path, size, mtime, partial_hash=None, full_hash=None, connection=None, relpath=None):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.partial_hash = partial_hash
+        self.full_hash = full_hash
+        self.connection = connection
+        self.relpath = relpath
+
+    def get_partial_hash(self):
+        if not self.partial_hash:
+            self.partial_hash = get_partial_hash(self.path, self.size)
+            if self.connection:
+                self.connection.execute('UPDATE files SET partial_hash = ? WHERE path = ?',
+                                        (self.partial_hash, self.relpath))
+        return self.partial_hash
+
+    def get_full_hash(self):
+        if not self.full_hash:
+            self.full_hash = get_full_hash(self.path)
+            if self.connection:
+                self.connection.execute('UPDATE files SET full_hash = ? WHERE path = ?',
+                                        (self.full_hash, self.relpath))
+        return self.full_hash
+
+
+class DuplicateFinder(object):
+    """finds files with the same content in the archive roots and among
+    the files checked before. Candidates need the same size, then the
+    same partial hash and finally the same hash of the whole content so
+    that most files are rejected by their size alone."""
+
+    def __init__(self, archivepath):
+        self.connections = []
+        for root in get_archive_roots(archivepath):
+            connection = open_archive_index(root.path)
+            update_file_index(connection, root.path)
+            self.connections.append((root.path, connection))
+        self.checked_files = {}  # size -> list of HashedFile
+
+    def get_candidates(self, size):
+        """yields the HashedFile of all known files of size"""
+
+        for archivepath, connection in self.connections:
+            for relpath, mtime, partial_hash, full_hash in connection.execute(
+                    'SELECT path, mtime, partial_hash, full_hash FROM files WHERE size = ?', (size,)).fetchall():
+                yield HashedFile(os.path.join(archivepath, relpath), size, mtime, partial_hash, full_hash,
+                                 connection, relpath)
+        for checked_file in self.checked_files.get(size, []):
+            yield checked_file
+
+    def find_duplicate(self, itemname):
+        """returns the name of a file with the same content as itemname or
+        None. Directories, links and empty files are never duplicates."""
+
+        try:
+            item_stat = os.stat(itemname, follow_symlinks=False)
+        except OSError:
+            return None
+        if not stat.S_ISREG(item_stat.st_mode) or not item_stat.st_size:
+            return None
+
+        item = HashedFile(itemname, item_stat.st_size, item_stat.st_mtime_ns)
+        for candidate in self.get_candidates(item.size):
+            try:
+                candidate_stat = os.stat(candidate.path, follow_symlinks=False)
+            except OSError:
+                continue
+            if (candidate_stat.st_dev, candidate_stat.st_ino) == (item_stat.st_dev, item_stat.st_ino) or \
+               (candidate_stat.st_size, candidate_stat.st_mtime_ns) != (candidate.size, candidate.mtime):
+                # the item itself or changed since it was indexed:
+                continue
+            if candidate.get_partial_hash() == item.get_partial_hash() and \
+               candidate.get_full_hash() == item.get_full_hash():
+                return candidate.path
+
+        self.checked_files.setdefault(item.size, []).append(item)
+        return None
+
+    def close(self):
+        for archivepath, connection in self.connections:
+            connection.commit()
+            connection.close()
+
+
+def remove_duplicate_items(items, archivepath):
+    """checks the items (ArchiveItem) for files whose content is in the
+    archive already ("--duplicates") and returns the items to move"""
+
+    with measure_phase('duplicates'):
+        finder = DuplicateFinder(archivepath)
+        try:
+            remaining_items = []
+            for item in items:
+                duplicate = finder.find_duplicate(item.path)
+                if not duplicate:
+                    remaining_items.append(item)
+                    continue
+                count_metric('duplicate items')
+                if options.duplicates == 'report':
+                    logging.warning('"%s" has the same content as "%s".' % (item.path, duplicate))
+                    remaining_items.append(item)
+                else:
+                    logging.warning('"%s" has the same content as "%s". Skipping.' % (item.path, duplicate))
+        finally:
+            finder.close()
+    return remaining_items
+
+
 def longestSubstringFinder(string1, string2):
-    ## this is from: https://stackoverflow.com/a/18717762
     ## print(longestSubstringFinder("apple pie available", "apple pies")) ## apple pie
     ## print(longestSubstringFinder("apples", "appleses")) ## apples
     ## print(longestSubstringFinder("bapples", "cappleses")) ## apples
-    '''Its called Longest Common Substring problem. Here I present a
-    simple, easy to understand but inefficient solution. It will take
-    a long time to produce correct output for large strings, as the
-    complexity of this algorithm is O(N^2).''' 
-    answer = ""
-    len1, len2 = len(string1), len(string2)
-    for i in range(len1):
-        match = ""
-        for j in range(len2):
-            if (i + j < len1 and string1[i + j] == string2[j]):
-                match += string2[j]
+    """returns the longest common substring of two strings"""
+
+    return longest_common_substring([string1, string2])
+
+
+def longest_common_substring(strings):
+    """returns the longest string which is a substring of all strings. If
+    there are several, the one occurring first in the shortest string is
+    returned.
+
+    A suffix automaton of the shortest string is built and all other
+    strings are run through it. This is linear in the total length of
+    the strings instead of quadratic for each pair."""
+
+    if not strings:
+        return ""
+    base_index = min(range(len(strings)), key=lambda index: len(strings[index]))
+    base = strings[base_index]
+
+    # suffix automaton of base; per state: suffix link, length of the
+    # longest string, transitions and end position of its first occurrence:
+    link = [-1]
+    length = [0]
+    transitions = [{}]
+    first_end = [-1]
+    last = 0
+    for position, character in enumerate(base):
+        current = len(length)
+        link.append(-1)
+        length.append(length[last] + 1)
+        transitions.append({})
+        first_end.append(position)
+        state = last
+        while state != -1 and character not in transitions[state]:
+            transitions[state][character] = current
+            state = link[state]
+        if state == -1:
+            link[current] = 0
+        else:
+            successor = transitions[state][character]
+            if length[state] + 1 == length[successor]:
+                link[current] = successor
             else:
-                if (len(match) > len(answer)): answer = match
-                match = ""
-    return answer
+                clone = len(length)
+                link.append(link[successor])
+                length.append(length[state] + 1)
+                transitions.append(dict(transitions[successor]))
+                first_end.append(first_end[successor])
+                while state != -1 and transitions[state].get(character) == successor:
+                    transitions[state][character] = clone
+                    state = link[state]
+                link[successor] = clone
+                link[current] = clone
+        last = current
+
+    # states ordered by decreasing length so that matches propagate along suffix links:
+    states_by_length = sorted(range(1, len(length)), key=length.__getitem__, reverse=True)
+    common_length = length[:]
+    for index, string in enumerate(strings):
+        if index == base_index:
+            continue
+        matched = [0] * len(length)
+        state = 0
+        current_length = 0
+        for character in string:
+            while state != 0 and character not in transitions[state]:
+                state = link[state]
+                current_length = length[state]
+            if character in transitions[state]:
+                state = transitions[state][character]
+                current_length += 1
+                if current_length > matched[state]:
+                    matched[state] = current_length
+            else:
+                state = 0
+                current_length = 0
+        for state in states_by_length:
+            if matched[state]:
+                matched[link[state]] = length[link[state]]
+        for state in range(len(length)):
+            if matched[state] < common_length[state]:
+                common_length[state] = matched[state]
+
+    best_state = 0
+    for state in range(1, len(length)):
+        if common_length[state] > common_length[best_state] or \
+           (common_length[state] == common_length[best_state] and
+            first_end[state] - common_length[state] < first_end[best_state] - common_length[best_state]):
+            best_state = state
+    if not common_length[best_state]:
+        return ""
+    end = first_end[best_state] + 1
+    return base[end - common_length[best_state]:end]
 
 
 def startswith_datestamp(filename):
@@ -449,24 +2675,28 @@ def startswith_datestamp(filename):
         return False
 
 
-def guess_new_directory_basename(filename1, filename2):
-    """analyzes two filenames and tries to extract a potential archive directory name.
+def guess_new_directory_basename(filenames):
+    """analyzes filenames and tries to extract a potential archive directory name.
     E.g., "2023-06-11T12.26.18 Wedding of Paula and John - Guests arriving.jpg"
     with  "2023-06-11T13.05.48 Wedding of Paula and John - Ceremony starts.jpg"
     results in: "Wedding of Paula and John"
+
+    For more than GUESS_SAMPLE_SIZE filenames, an evenly spread sample is analyzed.
     """
 
+    if len(filenames) > GUESS_SAMPLE_SIZE:
+        filenames = [filenames[index * len(filenames) // GUESS_SAMPLE_SIZE] for index in range(GUESS_SAMPLE_SIZE)]
+
     # omit path and filename extensions:
-    file1 = os.path.basename(os.path.splitext(filename1)[0])
-    file2 = os.path.basename(os.path.splitext(filename2)[0])
-    
-    if startswith_datestamp(file1) and startswith_datestamp(file2):
+    files = [os.path.basename(os.path.splitext(filename)[0]) for filename in filenames]
+
+    if all(startswith_datestamp(file) for file in files):
         # cut most probably identical datestamp to avoid false positive matchstring:
-        logging.debug('guess_new_directory_basename: finding longest common prefix after omitting time- or datestamps (remove anything before first space or underliner)')
-        substring = longestSubstringFinder(re.sub(r'.*?[ _](.*)', r'\1', file1), re.sub(r'.*?[ _](.*)', r'\1', file2))
+        logging.debug('guess_new_directory_basename: finding longest common substring after omitting time- or datestamps (remove anything before first space or underliner)')
+        substring = longest_common_substring([re.sub(r'.*?[ _](.*)', r'\1', file) for file in files])
     else:
-        logging.debug('guess_new_directory_basename: finding longest common prefix')
-        substring = longestSubstringFinder(file1, file2)
+        logging.debug('guess_new_directory_basename: finding longest common substring')
+        substring = longest_common_substring(files)
 
     if substring:
         # delete any pre- or postfixes with a dash and space:
@@ -478,6 +2708,92 @@ def guess_new_directory_basename(filename1, filename2):
         return None    
 
     
+def get_suggestions(items, archivepath):
+    """returns the existing directories matching the items (ArchiveItem)
+    and the guessed name for a new directory (or None)"""
+
+    directory_suggestions = get_potential_target_directories(items, archivepath)
+    directory_suggestions += get_name_matching_directories(items, archivepath, directory_suggestions)
+    new_dir_basename_guess = None
+    if len(items) > 1:
+        new_dir_basename_guess = guess_new_directory_basename([item.path for item in items])
+    return directory_suggestions, new_dir_basename_guess
+
+
+def print_suggestions(directory_suggestions, new_dir_basename_guess):
+    """prints the suggestions of get_suggestions() if there are any"""
+
+    if directory_suggestions or new_dir_basename_guess:
+        print_potential_target_directories(directory_suggestions, new_dir_basename_guess)
+
+
+def print_suggestions_above_prompt(future, prompt, readline, prompt_lock, prompt_answered, suggestions_shown):
+    """prints the suggestions of a finished get_suggestions() call while
+    the user is typing: the prompt line is cleared, the suggestions are
+    printed and the prompt is printed again with the text typed so far.
+    Nothing is printed once the prompt_answered event is set; the
+    suggestions_shown event is set when the suggestions got printed.
+    Both events are only changed while holding prompt_lock."""
+
+    if future.cancelled() or future.exception():
+        # reported when waiting for the result after the prompt
+        return
+    with prompt_lock:
+        if prompt_answered.is_set():
+            return
+        sys.stdout.write('\r\x1b[K')
+        print_suggestions(*future.result())
+        sys.stdout.write(prompt + readline.get_line_buffer())
+        sys.stdout.flush()
+        suggestions_shown.set()
+
+
+def run_in_background(function, *args):
+    """runs function(*args) in a daemon thread and returns a Future of its
+    result; unlike the threads of a ThreadPoolExecutor, the thread does not
+    delay the exit of the program when the user aborts with Ctrl-C"""
+
+    from concurrent.futures import Future
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(function(*args))
+        except BaseException as detail:
+            future.set_exception(detail)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def get_completion_words(archivepath):
+    """returns the words of the file names and the names of archive folders
+    (with "--complete-archive-folders") for TAB completion"""
+
+    with measure_phase('vocabulary'):
+        vocabulary = locate_and_parse_controlled_vocabulary()
+    if not vocabulary:
+        vocabulary = []
+    folder_names = []
+    if options.complete_archive_folders:
+        folder_names = get_archive_folder_basenames(archivepath)
+    return vocabulary, folder_names
+
+
+def prefetch_item_status(items):
+    """gets the status of the items (ArchiveItem) so that it is cached
+    by the operating system when the moves are planned; pays off on
+    network file systems"""
+
+    for item in items:
+        try:
+            os.lstat(item.path)
+        except OSError:
+            pass
+
+
 def print_potential_target_directories(directory_suggestions, new_dir_basename_guess):
     """prints list of potential target directories with their shortcuts."""
 
@@ -512,9 +2828,624 @@ def is_an_integer(data):
         return False
 
 
+def get_name_components(item):
+    """returns the lowercase words of the name of an item (ArchiveItem)
+    without its datestamp and extension; used to separate events"""
+
+    return set(get_name_words(os.path.splitext(item.basename)[0]))
+
+
+def get_name_words(name):
+    """returns the lowercase words of a name without its datestamps;
+    short words and words of FILENAME_COMPONENT_LOWERCASE_BLACKLIST are
+    left out"""
+
+    blacklist = FILENAME_COMPONENT_LOWERCASE_BLACKLIST
+    return [word.lower() for word in FILENAME_COMPONENT_REGEX.findall(DATESTAMP_REGEX.sub('', name))
+            if len(word) > 2 and word.lower() not in blacklist]
+
+
+def cluster_items(items, gap):
+    """splits items (ArchiveItem with datestamps) into events: after
+    sorting them by datestamp and name, a new event starts if the dates
+    of two consecutive items are more than gap days apart or if both
+    names have words but none in common.
+
+    @param return: list of events, each a list of items
+    """
+
+    events = []
+    previous_components = set()
+    for item in sorted(items, key=lambda item: (item.date, item.basename)):
+        components = get_name_components(item)
+        if not events or (item.date - events[-1][-1].date).days > gap or \
+                (components and previous_components and not components & previous_components):
+            events.append([])
+            previous_components = set()
+        events[-1].append(item)
+        if components:
+            previous_components = components
+    logging.debug("found %i event(s) within %i item(s)" % (len(events), len(items)))
+    return events
+
+
+def trim_to_common_words(name, items):
+    """removes partial words at the start and at the end of a name guessed
+    by guess_new_directory_basename() that are not whole words of all
+    items (ArchiveItem), e.g. "Birthday party ca" of "... cake.jpg" and
+    "... candles.jpg". Returns None if no name is left."""
+
+    common_words = None
+    for item in items:
+        words = set(re.findall(r'\w+', os.path.splitext(item.basename)[0].lower()))
+        common_words = words if common_words is None else common_words & words
+
+    while True:
+        last_word = re.search(r'(\w+)\W*$', name)
+        if not last_word or last_word.group(1).lower() in common_words:
+            break
+        name = name[:last_word.start()]
+    while True:
+        first_word = re.match(r'\W*(\w+)', name)
+        if not first_word or first_word.group(1).lower() in common_words:
+            break
+        name = name[first_word.end():]
+
+    name = name.strip(' -_')
+    if len(name) > 3 and FILENAME_COMPONENT_REGEX.search(DATESTAMP_REGEX.sub('', name)):
+        return name
+    return None
+
+
+def get_event_directory_name(event, archivepath):
+    """returns the name of the directory of an event (list of ArchiveItem):
+    an existing directory of the archive near its date with a matching
+    name or the name guessed from the items. Returns None for events
+    without a guessable name or with a single item."""
+
+    if len(event) < 2:
+        return None
+    name = guess_new_directory_basename([item.path for item in event])
+    if name:
+        name = trim_to_common_words(name, event)
+    if not name:
+        return None
+
+    for directory in get_potential_target_directories(event, archivepath):
+        directory_name = FOLDERNAME_DATESTAMP_PREFIX_REGEX.sub('', directory, count=1).strip().lower()
+        if directory_name and (name.lower() in directory_name or directory_name in name.lower()):
+            logging.debug('event "%s" matches existing directory "%s"' % (name, directory))
+            return directory
+    return name
+
+
+def archive_clusters(items, archivepath):
+    """splits items into events (see cluster_items()) and moves each
+    event into its own directory in a single plan"""
+
+    with measure_phase('validation'):
+        assert_each_item_has_datestamp(items)
+    if options.duplicates:
+        items = remove_duplicate_items(items, archivepath)
+
+    moves = []
+    with measure_phase('clustering'):
+        events = cluster_items(items, options.cluster_gap)
+        for event in events:
+            name = get_event_directory_name(event, archivepath)
+            if name:
+                # the first item has the earliest datestamp:
+                targetdir = generate_absolute_target_dir(name, event[:1], archivepath)
+                logging.info('%i item(s) of %s to %s: "%s"' % (len(event), event[0].date.isoformat()[:10],
+                                                               event[-1].date.isoformat()[:10], targetdir))
+                moves.extend((item.path, targetdir) for item in event)
+            else:
+                logging.info('%i item(s) of %s to %s without event name: moving to year folder' %
+                             (len(event), event[0].date.isoformat()[:10], event[-1].date.isoformat()[:10]))
+                moves.extend((item.path, get_destination_of_item(
+                    item, select_archive_root(archivepath, item.year), None)) for item in event)
+
+    with measure_phase('planning'):
+        make_sure_layout_directories_exist(set(destination for itemname, destination in moves))
+        plan = group_moves(moves)
+    execute_move_plan(plan)
+
+
+def reshard_yearfolder(yearfolder):
+    """moves the items of a year folder into the directories of
+    "--layout" using renames, STREAM_CHUNK_SIZE items at a time. Items
+    without datestamp (like the folders of the layout) or with a
+    datestamp of another year stay where they are."""
+
+    yearfolder = os.path.abspath(yearfolder)
+    if not YEARFOLDER_REGEX.match(os.path.basename(yearfolder)) or not os.path.isdir(yearfolder):
+        error_exit(13, '"%s" is no year folder of an archive! Aborting.' % yearfolder)
+    archivepath = os.path.dirname(yearfolder)
+    year = int(os.path.basename(yearfolder))
+
+    with os.scandir(yearfolder) as entries:
+        itemnames = sorted(entry.path for entry in entries if not entry.name.startswith('.'))
+    logging.info('resharding %i entries of "%s" with layout "%s"' % (len(itemnames), yearfolder, options.layout))
+
+    # each chunk lists the destinations again (with the items moved before) so that the
+    # listings of earlier chunks are not kept:
+    for start in range(0, len(itemnames), STREAM_CHUNK_SIZE):
+        moves = []
+        for item in parse_items(itemnames[start:start + STREAM_CHUNK_SIZE]):
+            if item.year != year:
+                logging.debug('leaving "%s" in the year folder' % item.path)
+                continue
+            destination = os.path.join(archivepath, get_layout_directory(item.date, item.basename))
+            if destination == item.path or destination.startswith(item.path + os.sep):
+                # a folder of the layout like "2023/2023-01-11"
+                logging.debug('leaving layout folder "%s" in the year folder' % item.path)
+            elif destination != yearfolder:
+                moves.append((item.path, destination))
+        with measure_phase('planning'):
+            make_sure_layout_directories_exist(set(destination for itemname, destination in moves))
+            plan = group_moves(moves)
+        execute_move_plan(plan)
+
+
+class InotifyWatcher(object):
+    """reports new or changed entries of directories using inotify (Linux only)"""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+
+    def __init__(self, directories):
+        import ctypes
+        import ctypes.util
+        import struct
+        self.event_header = struct.Struct('iIII')
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.directories = {}
+        mask = self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        for directory in directories:
+            watch_descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+            if watch_descriptor < 0:
+                errorcode = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(errorcode, 'can not watch "%s"' % directory)
+            self.directories[watch_descriptor] = directory
+
+    def read_changed_items(self, timeout):
+        """waits up to timeout seconds (forever if None) and returns the
+        paths of all entries that were created or changed meanwhile"""
+
+        import select
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        data = os.read(self.fd, 64 * 1024)
+        changed_items = []
+        offset = 0
+        while offset < len(data):
+            watch_descriptor, mask, cookie, length = self.event_header.unpack_from(data, offset)
+            offset += self.event_header.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                logging.warning('too many file system events; checking all watched directories again')
+                changed_items.extend(list_directory_entries(self.directories.values()))
+            elif name and watch_descriptor in self.directories:
+                changed_items.append(os.path.join(self.directories[watch_descriptor], name))
+        return changed_items
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher(object):
+    """reports all entries of directories periodically; used where inotify is not available"""
+
+    POLLING_INTERVAL = 5.0
+
+    def __init__(self, directories):
+        self.directories = list(directories)
+
+    def read_changed_items(self, timeout):
+        if timeout is None or timeout > self.POLLING_INTERVAL:
+            timeout = self.POLLING_INTERVAL
+        time.sleep(timeout)
+        return list_directory_entries(self.directories)
+
+    def close(self):
+        pass
+
+
+def list_directory_entries(directories):
+    """returns the paths of all entries of directories"""
+
+    entries = []
+    for directory in directories:
+        entries.extend(os.path.join(directory, name) for name in os.listdir(directory))
+    return entries
+
+
+def archive_watched_items(itemnames, archivepath):
+    """moves settled items of watched inboxes to <archivepath>/<YYYY>.
+    Errors are logged and do not stop watching."""
+
+    items_with_datestamp = []
+    for item in parse_items(sorted(itemnames)):
+        if item.date:
+            items_with_datestamp.append(item)
+        else:
+            logging.warning('item "%s" has got no valid datestamp! Not moving it.' % item.path)
+
+    if not items_with_datestamp:
+        return
+    try:
+        execute_move_plan(plan_moves(items_with_datestamp, archivepath, None))
+    except ArchiveError as error:
+        logging.error(error.text)
+    sys.stdout.flush()
+
+
+def watch_inboxes(inboxes, archivepath, settle_time):
+    """moves items appearing in the inbox directories to the archive until
+    interrupted. An item is moved once its size and mtime did not change
+    for settle_time seconds so that files still being written stay put."""
+
+    for inbox in inboxes:
+        if not os.path.isdir(inbox):
+            error_exit(12, 'Watched inbox "%s" is not a directory! Aborting.' % inbox)
+
+    try:
+        watcher = InotifyWatcher(inboxes)
+    except (OSError, AttributeError) as detail:
+        logging.info('inotify is not available (%s); checking the inboxes every %i seconds' %
+                     (detail, PollingWatcher.POLLING_INTERVAL))
+        watcher = PollingWatcher(inboxes)
+
+    logging.info('watching %s; moving items to "%s" (abort with Ctrl-C)' %
+                 (', '.join('"%s"' % inbox for inbox in inboxes), archivepath))
+
+    # path -> ((size, mtime), time of last change) of items that wait for settling:
+    unsettled_items = dict.fromkeys(list_directory_entries(inboxes))
+    # path -> (size, mtime) of items which were not moved (e.g. without datestamp or
+    # because of a collision); they are ignored until they change:
+    rejected_items = {}
+    try:
+        while True:
+            timeout = settle_time if unsettled_items else None
+            for itemname in watcher.read_changed_items(timeout):
+                # changes of items already waiting are detected by their size and mtime (the
+                # PollingWatcher reports all items each time):
+                unsettled_items.setdefault(itemname, None)
+
+            now = time.monotonic()
+            settled_items = {}
+            for itemname, state in list(unsettled_items.items()):
+                try:
+                    item_stat = os.stat(itemname)
+                except OSError:
+                    # already moved or deleted meanwhile:
+                    del unsettled_items[itemname]
+                    rejected_items.pop(itemname, None)
+                    continue
+                signature = (item_stat.st_size, item_stat.st_mtime_ns)
+                if os.path.basename(itemname).startswith('.') or rejected_items.get(itemname) == signature:
+                    del unsettled_items[itemname]
+                elif state is None or state[0] != signature:
+                    unsettled_items[itemname] = (signature, now)
+                elif now - state[1] >= settle_time:
+                    del unsettled_items[itemname]
+                    settled_items[itemname] = signature
+
+            if settled_items:
+                archive_watched_items(list(settled_items), archivepath)
+                for itemname, signature in settled_items.items():
+                    if os.path.lexists(itemname):
+                        rejected_items[itemname] = signature
+                    else:
+                        rejected_items.pop(itemname, None)
+    finally:
+        watcher.close()
+
+
+def read_itemnames(filename, null_delimited=False):
+    """generator: yields the item names listed in filename ("-" for stdin)
+    while reading it. Items are separated by newlines or null characters."""
+
+    if filename == '-':
+        stream = sys.stdin.buffer
+    else:
+        stream = open(filename, 'rb')
+
+    separator = b'\0' if null_delimited else b'\n'
+    try:
+        pending = b''
+        while True:
+            # read1() returns what is available so that items are yielded early:
+            data = stream.read1(64 * 1024)
+            if not data:
+                break
+            names = (pending + data).split(separator)
+            pending = names.pop()
+            for name in names:
+                name = os.fsdecode(name)
+                if not null_delimited:
+                    name = name.strip()
+                if name:
+                    yield name
+        name = os.fsdecode(pending)
+        if not null_delimited:
+            name = name.strip()
+        if name:
+            yield name
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+
+def archive_itemname_stream(itemnames, archivepath, targetdir):
+    """moves a (long) stream of items in chunks of STREAM_CHUNK_SIZE items.
+    Memory usage does not grow with the number of items and the first
+    items are moved before the stream is read completely.
+
+    If targetdir contains no datestamp, it is taken from the first chunk."""
+
+    chunks = iter(lambda: parse_items(itertools.islice(itemnames, STREAM_CHUNK_SIZE)), [])
+    if targetdir:
+        first_chunk = next(chunks, None)
+        if not first_chunk:
+            return
+        targetdir = generate_absolute_target_dir(targetdir, first_chunk, archivepath)
+        chunks = itertools.chain([first_chunk], chunks)
+
+    number_of_items = 0
+    for chunk in chunks:
+        if not targetdir:
+            assert_each_item_has_datestamp(chunk)
+        # a new DirectoryListingCache per chunk: items moved by earlier chunks are
+        # listed again instead of keeping one name per item of the stream
+        execute_move_plan(plan_moves(chunk, archivepath, targetdir))
+        number_of_items += len(chunk)
+    logging.debug("processed %i items of the stream" % number_of_items)
+
+
+def resume_journal(filename):
+    """executes the planned moves of a journal which are not done yet.
+    Target directories that were planned but not created yet are
+    created first. Further records are appended to the same journal."""
+
+    records = MoveJournal.read(filename)
+    finished = set((record['item'], record['destination']) for record in records
+                   if record['op'] in ('done', 'skipped'))
+
+    for record in records:
+        if record['op'] == 'mkdir' and not os.path.isdir(record['destination']):
+            logging.info('creating target directory: "%s"' % record['destination'])
+            if not options.dryrun:
+                make_directory(record['destination'])
+
+    moves = []
+    for record in records:
+        move = (record['item'], record['destination'])
+        if record['op'] != 'planned' or move in finished:
+            continue
+        finished.add(move)
+        if not os.path.lexists(record['item']) and \
+           os.path.lexists(os.path.join(record['destination'], os.path.basename(record['item']))):
+            # moved but interrupted before it was recorded:
+            logging.debug('"%s" was already moved' % record['item'])
+            journal_move('done', record['item'], record['destination'])
+            continue
+        moves.append(move)
+
+    logging.info('resuming %i unfinished move(s) of journal "%s"' % (len(moves), filename))
+    execute_move_plan(group_moves(moves))
+
+
+def undo_journal(filename):
+    """moves the items back which were moved according to a journal, the
+    last move first. Created directories are not removed."""
+
+    records = MoveJournal.read(filename)
+    undone = set((record['item'], record['destination']) for record in records if record['op'] == 'undone')
+    moves = [(record['item'], record['destination']) for record in records
+             if record['op'] == 'done' and (record['item'], record['destination']) not in undone]
+
+    # other runs must not move items into the original directories meanwhile:
+    with lock_directories(os.path.dirname(os.path.abspath(item)) for item, destination in moves):
+        for item, destination in reversed(moves):
+            movedfilename = os.path.join(destination, os.path.basename(item))
+            pretty_print_move_item_information(movedfilename, os.path.dirname(item))
+            if options.dryrun:
+                continue
+            if not os.path.lexists(movedfilename):
+                logging.warning('Cannot move "%s" back because it does not exist any more. Skipping.' % movedfilename)
+                continue
+            try:
+                move_back(movedfilename, item)
+            except FileExistsError:
+                logging.warning('Cannot move "%s" back to "%s" because it already exists. Skipping.' %
+                                (movedfilename, item))
+                continue
+            except (IOError, shutil.Error) as detail:
+                error_exit(5, 'Cannot move "%s" to "%s". Aborting.\n%s' % (movedfilename, item, detail))
+            journal_move('undone', item, destination)
+
+
+def move_back(movedfilename, item):
+    """moves an archived item back to its original path without replacing
+    anything; raises FileExistsError if the path exists"""
+
+    try:
+        rename_without_replacing(movedfilename, item)
+    except OSError as detail:
+        if detail.errno != errno.EXDEV:
+            raise
+        # shutil.move() would move the item into an existing directory:
+        if os.path.lexists(item):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), item)
+        shutil.move(movedfilename, item, copy_function=copy_file)
+
+
+def get_options(**settings):
+    """returns options for the library functions: the defaults of the
+    command line options, overwritten by settings. The names of the
+    settings are the dest names of the command line options, e.g.:
+
+        get_options(append=True, jobs=4)
+
+    Unlike the command line tool, the library functions do not print
+    the moved items unless quiet=False is given.
+    """
+
+    settings_with_defaults = parser.get_default_values()
+    settings_with_defaults.quiet = True
+    for name, value in settings.items():
+        if not hasattr(settings_with_defaults, name):
+            raise TypeError('unknown option "%s"' % name)
+        setattr(settings_with_defaults, name, value)
+    return settings_with_defaults
+
+
+def plan_archiving(items, archivepath=None, targetdir=None, settings=None):
+    """library function: returns a plan for moving items into the archive
+    without asking for anything (like "--batchmode").
+
+    If targetdir is given, it is created (with a datestamp of the items
+    if it contains none) and all items are planned to move there.
+    Otherwise each item is planned to move to its <archivepath>/<YYYY>.
+    settings are options from get_options() and are used until the
+    next call of a library function. As options are global, process
+    one batch after another.
+
+    Raises ArchiveError on errors.
+
+    @param return: move plan for execute_move_plan()
+    """
+
+    global options, user_selected_suggested_directory
+    options = settings if settings else get_options()
+    user_selected_suggested_directory = False
+
+    try:
+        check_options()
+    except ValueError as detail:
+        error_exit(14, 'Invalid settings: %s' % detail)
+    if not archivepath:
+        archivepath = get_default_archive_path()
+    check_archive_roots(archivepath)
+
+    items = parse_items(items)
+    if targetdir:
+        targetdir = generate_absolute_target_dir(targetdir, items, archivepath)
+    return plan_items(items, archivepath, targetdir)
+
+
+def check_options():
+    """checks the values of the options of the command line and of the
+    settings of the library functions alike; raises ValueError"""
+
+    try:
+        check_layout(options.layout)
+    except ValueError as detail:
+        raise ValueError('Option "--layout": %s' % detail)
+    for value in options.archive_roots or []:
+        try:
+            parse_archive_root(value)
+        except ValueError as detail:
+            raise ValueError('Option "--archive-root": %s' % detail)
+    if options.jobs < 1:
+        raise ValueError('The number of "--jobs" has to be at least 1')
+    if options.suggestion_range < 0:
+        raise ValueError('The "--suggestion-range" must not be negative')
+    if options.name_suggestions < 0:
+        raise ValueError('The number of "--name-suggestions" must not be negative')
+    if options.max_files_per_sec is not None and options.max_files_per_sec <= 0:
+        raise ValueError('The "--max-files-per-sec" has to be positive')
+    if options.cluster_gap < 0:
+        raise ValueError('The "--cluster-gap" must not be negative')
+
+
+def check_archive_roots(archivepath):
+    """aborts if archivepath or an archive root of "--archive-root" is no
+    directory"""
+
+    if not os.path.isdir(archivepath):
+        error_exit(1, 'The archive directory "%s" is not a directory!\n'
+                      'Modify the default setting in "%s" or provide a valid directory '
+                      'with the command line option "--archivepath".' % (archivepath, __file__))
+    for root in get_archive_roots(archivepath):
+        if not os.path.isdir(root.path):
+            error_exit(1, 'The archive root "%s" is not a directory!' % root.path)
+
+
+def plan_items(items, archivepath, targetdirname):
+    """returns the plan (see plan_moves()) for moving the items
+    (ArchiveItem) into targetdirname, an absolute path like the one of
+    generate_absolute_target_dir(). Without targetdirname, each item
+    is moved to the folder of its datestamp which it needs to have."""
+
+    if not targetdirname:
+        with measure_phase('validation'):
+            assert_each_item_has_datestamp(items)
+    return plan_moves(items, archivepath, targetdirname)
+
+
+def archive_items(items, archivepath=None, targetdir=None, settings=None):
+    """library function: moves items into the archive like plan_archiving()
+    describes it. Raises ArchiveError on errors."""
+
+    execute_move_plan(plan_archiving(items, archivepath, targetdir, settings))
+
+
 def main():
     """Main function"""
 
+    global options, args, metrics
+    (options, args) = parser.parse_args()
+    # item names of "--from-file" are stripped while reading unless they are null-delimited:
+    args = [arg.strip() for arg in args]
+
+    if options.stats or options.metrics_json:
+        metrics = Metrics()
+
+    try:
+        handle_command_line()
+    except ArchiveError as error:
+        sys.stdout.flush()
+        logging.error(error.text)
+
+        if options.dryrun or options.pauseonexit:
+            input(PAUSEONEXITTEXT)
+
+        sys.exit(error.errorcode)
+    finally:
+        if journal:
+            journal.close()
+        if metrics:
+            report_metrics()
+
+
+def report_metrics():
+    """prints and/or writes the metrics of the run"""
+
+    if options.stats:
+        metrics.print_report()
+    if options.metrics_json:
+        import json
+        with open(options.metrics_json, 'w', encoding='utf-8') as metricsfile:
+            json.dump(metrics.get_report(), metricsfile, indent=2)
+
+
+def handle_command_line():
+    """moves the items of the command line, asking for a target directory
+    if necessary"""
+
     if options.version:
         print("%s version %s" % (os.path.basename(sys.argv[0]), PROG_VERSION_DATE))
         sys.exit(0)
@@ -526,10 +3457,54 @@ def main():
     if options.dryrun:
         logging.info('Option "--dryrun" found, running a simulation, not modifying anything on file system:')
 
+    try:
+        check_options()
+    except ValueError as detail:
+        parser.error(str(detail))
+
+    global throttle
+    max_bandwidth = None
+    if options.max_bandwidth:
+        try:
+            max_bandwidth = parse_byte_size(options.max_bandwidth)
+        except ValueError as detail:
+            parser.error('Option "--max-bandwidth": %s' % detail)
+    if max_bandwidth or options.max_files_per_sec or options.backoff:
+        throttle = IOThrottle(max_bandwidth, options.max_files_per_sec, options.backoff)
+    if options.idle_io:
+        set_idle_io_priority()
+
+    global journal
+    if len([journalfile for journalfile in (options.journal, options.resume, options.undo) if journalfile]) > 1:
+        parser.error('Please use only one of "--journal", "--resume" and "--undo"')
+
+    if options.resume or options.undo:
+        if args:
+            parser.error('Options "--resume" and "--undo" do not take any file name as argument')
+        if not options.dryrun:
+            journal = MoveJournal(options.resume or options.undo)
+        if options.resume:
+            resume_journal(options.resume)
+        else:
+            undo_journal(options.undo)
+        logging.debug("successfully processed all items.")
+        return
+
+    if options.journal:
+        journal = MoveJournal(options.journal)
+
     if options.append and not options.targetdir:
         logging.warning('The "--append" options is only necessary in combination '
                         'with the "--directory" option. Ignoring this time.')
 
+    if options.reshard:
+        if not args:
+            parser.error('Option "--reshard" requires the year folders to reshard as arguments')
+        for yearfolder in args:
+            reshard_yearfolder(yearfolder)
+        logging.debug("successfully processed all items.")
+        return
+
 #    if options.batchmode and not options.targetdir:
 #        error_exit(10, 'Option "--batchmode" requires "--directory": ' +
 #                   'you need to tell me what to do in batchmode.')
@@ -539,59 +3514,117 @@ def main():
         logging.debug('overwriting default archive dir with: "%s"' % options.archivepath)
         archivepath = options.archivepath
     else:
-        archivepath = DEFAULT_ARCHIVE_PATH
+        archivepath = get_default_archive_path()
 
-    if not os.path.isdir(archivepath):
-        error_exit(1, '\n\nThe archive directory "%s" is not a directory!\n'
-                      'modify default setting in "%s" or provide a valid '
-                      'directory with command line option "--archivepath".\n' % (archivepath, sys.argv[0]))
+    check_archive_roots(archivepath)
+
+    if options.watch:
+        if args:
+            parser.error('Option "--watch" does not take any file name as argument')
+        watch_inboxes(options.watch, archivepath, options.watch_settle_time)
+        return
+
+    if options.cluster:
+        if options.targetdir:
+            parser.error('Options "--cluster" and "--directory" can not be combined')
+        itemnames = args
+        if options.from_file:
+            itemnames = itertools.chain(args, read_itemnames(options.from_file, options.null_delimited))
+        with measure_phase('validation'):
+            items = parse_items(itemnames)
+        if not items:
+            parser.error("Please add at least one file name as argument")
+        archive_clusters(items, archivepath)
+        logging.debug("successfully processed all items.")
+        return
+
+    if options.from_file:
+        if not options.batchmode and not options.targetdir:
+            parser.error('Option "--from-file" requires "--batchmode" or "--directory"')
+        itemnames = itertools.chain(args, read_itemnames(options.from_file, options.null_delimited))
+        archive_itemname_stream(itemnames, archivepath, options.targetdir)
+        logging.debug("successfully processed all items.")
+        return
 
     if len(args) < 1:
         parser.error("Please add at least one file name as argument")
 
+    # parse each item only once:
+    with measure_phase('validation'):
+        items = parse_items(args)
+
     targetdirname = None
     if options.targetdir:
-        targetdirname = generate_absolute_target_dir(options.targetdir, args, archivepath)
+        targetdirname = generate_absolute_target_dir(options.targetdir, items, archivepath)
     elif not options.batchmode:
 
-        directory_suggestions = get_potential_target_directories(args, archivepath)
-        new_dir_basename_guess = False
-        if len(args) > 1:
-            new_dir_basename_guess = guess_new_directory_basename(args[0], args[1])
-            if new_dir_basename_guess:
-                number_of_suggestions = len(directory_suggestions) + 1
-            else:
-                number_of_suggestions = len(directory_suggestions)
-        else:
-            number_of_suggestions = len(directory_suggestions)
-        if number_of_suggestions > 0:
-            print_potential_target_directories(directory_suggestions, new_dir_basename_guess)
-
-        # parse file names for completion:
-        vocabulary = locate_and_parse_controlled_vocabulary()
-
-        if vocabulary:
-
-            assert(vocabulary.__class__ == list)
+        # the suggestions, the words for TAB completion and the status of
+        # the items are prepared in the background while the user types:
+        from concurrent.futures import TimeoutError
+        suggestions_future = run_in_background(get_suggestions, items, archivepath)
+        completion_future = run_in_background(get_completion_words, archivepath)
+        run_in_background(prefetch_item_status, items)
 
-            # Register our completer function
-            readline.set_completer(SimpleCompleter(vocabulary).complete)
+        try:
+            import readline  # also enables line editing for input()
+        except ImportError:
+            readline = None
+        prompt = 'Please enter directory basename: '
+        # suggestions found later are printed above the prompt which is only possible on terminals:
+        can_print_later = readline is not None and sys.stdin.isatty() and sys.stdout.isatty()
+        prompt_lock = threading.Lock()
+        prompt_answered = threading.Event()
+        # numbers only select suggestions which the user has seen before answering:
+        suggestions_shown = threading.Event()
 
-            # Use the tab key for completion
+        try:
+            with measure_phase('suggestions'):
+                directory_suggestions, new_dir_basename_guess = suggestions_future.result(
+                    timeout=PREFETCH_PROMPT_DELAY if can_print_later else None)
+            print_suggestions(directory_suggestions, new_dir_basename_guess)
+            suggestions_shown.set()
+        except TimeoutError:
+            print('\n (looking for matching target directories; they are shown as soon as they are found)')
+            suggestions_future.add_done_callback(
+                lambda future: print_suggestions_above_prompt(future, prompt, readline, prompt_lock,
+                                                              prompt_answered, suggestions_shown))
+
+        if readline:
+            readline.set_completer(PrefetchedCompleter(completion_future).complete)
             readline.parse_and_bind('tab: complete')
 
-            tabcompletiondescription = '; complete ' + str(len(vocabulary)) + ' words with TAB'
-
-            print('         (abort with Ctrl-C' + tabcompletiondescription + ')\n')
+        if completion_future.done() and not completion_future.exception():
+            vocabulary, folder_names = completion_future.result()
+            if vocabulary or folder_names:
+                tabcompletiondescription = '; complete ' + str(len(vocabulary)) + ' words'
+                if folder_names:
+                    tabcompletiondescription += ' and ' + str(len(folder_names)) + ' folder names'
+                tabcompletiondescription += ' with TAB'
+                print('         (abort with Ctrl-C' + tabcompletiondescription + ')\n')
+            else:
+                print('         (abort with Ctrl-C)\n')
+        elif readline:
+            print('         (abort with Ctrl-C; complete words with TAB)\n')
         else:
             print('         (abort with Ctrl-C)\n')
 
-        targetdirname = str(input('Please enter directory basename: ')).strip()
+        with measure_phase('prompt'):
+            try:
+                targetdirname = str(input(prompt)).strip()
+            finally:
+                with prompt_lock:
+                    prompt_answered.set()
+
+        with measure_phase('suggestions'):
+            directory_suggestions, new_dir_basename_guess = suggestions_future.result()
+        number_of_suggestions = len(directory_suggestions)
+        if new_dir_basename_guess:
+            number_of_suggestions += 1
 
         if (not targetdirname):
             # if no folder is given by the user, act like askfordir is not the case:
             logging.debug("targetdirname was empty: using default target folder")
-            assert_each_item_has_datestamp(args)
+            targetdirname = None
         else:
 
             if targetdirname == 'lp':
@@ -604,26 +3637,24 @@ def main():
                 logging.debug("targetdir-shortcut 'rp' (Rohpanorama) found")
                 targetdirname = make_sure_subdir_exists(os.getcwd(), 'Rohpanoramas')
 
-            elif number_of_suggestions > 0 and is_an_integer(targetdirname):
+            elif number_of_suggestions > 0 and suggestions_shown.is_set() and is_an_integer(targetdirname):
                 # special shortcut: numbers within number_of_suggestions are for suggested directories
                 targetdirint = int(targetdirname)
                 if targetdirint <= number_of_suggestions and targetdirint > 0:
                     global user_selected_suggested_directory
                     user_selected_suggested_directory = True
                     if targetdirint == number_of_suggestions and new_dir_basename_guess:
-                        targetdirname = generate_absolute_target_dir(new_dir_basename_guess, args, archivepath)
+                        targetdirname = generate_absolute_target_dir(new_dir_basename_guess, items, archivepath)
                     else:
                         targetdirname = directory_suggestions[targetdirint - 1]  # -1 fixes that we start from 1 instead of 0
-                        targetdirname = generate_absolute_target_dir(targetdirname, args, archivepath)
+                        targetdirname = generate_absolute_target_dir(targetdirname, items, archivepath)
                     logging.debug("user selected existing directory \"%s\"" % (targetdirname))
                 else:
                     # if number is not in range of suggestions, use it as folder name like below:
-                    targetdirname = generate_absolute_target_dir(targetdirname, args, archivepath)
+                    targetdirname = generate_absolute_target_dir(targetdirname, items, archivepath)
 
             else:
-                targetdirname = generate_absolute_target_dir(targetdirname, args, archivepath)
-    else:
-        assert_each_item_has_datestamp(args)
+                targetdirname = generate_absolute_target_dir(targetdirname, items, archivepath)
 
     if targetdirname:
         logging.debug('using targetdirname "%s"' % targetdirname)
@@ -631,8 +3662,7 @@ def main():
         logging.debug("using no targetdir, sorting each item into %s/<YYYY>" % archivepath)
 
     print('\n')  # make it more sexy
-    for itemname in args:
-        handle_item(itemname.strip(), archivepath, targetdirname)
+    execute_move_plan(plan_items(items, archivepath, targetdirname), options.jobs)
 
     logging.debug("successfully processed all items.")
 
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+PROG_VERSION = u"Time-stamp: <2026-10-16 12:00:00 vk>"
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import platform
+import tempfile
+import contextlib
+import subprocess
+from optparse import OptionParser
+from datetime import datetime, timedelta
+
+import move2archive
+
+USAGE = """
+    python3 -m move2archive.benchmark <options>
+
+This script measures the hot paths of move2archive using a synthetic
+archive and synthetic inboxes of datestamped file names which are
+generated in a temporary directory:
+
+     python3 -m move2archive.benchmark --output results.json
+... runs all benchmarks and writes the results to "results.json"
+
+     python3 -m move2archive.benchmark --compare results.json
+... runs all benchmarks and prints the change compared to "results.json"
+
+The startup benchmark imports move2archive in fresh interpreters using
+"python3 -X importtime". The benchmark exits with return value 1 if
+the import takes longer than "--startup-budget" or if any module that
+should be imported lazily is imported at startup.
+
+Moves across devices are only measured if "--cross-device-dir" is
+located on a different file system than the temporary directory
+(e.g. "/dev/shm").
+"""
+
+EVENT_NAME_WORDS = ['Wedding', 'Birthday', 'Hiking', 'Vacation', 'Concert', 'Party', 'Conference',
+                    'Graz', 'Vienna', 'Paula', 'John', 'Lake', 'Mountains', 'Garden', 'Museum']
+
+parser = OptionParser(usage=USAGE)
+
+parser.add_option("--years", dest="years", type="int", default=5,
+                  help="number of year folders of the synthetic archive. DEFAULT is 5", metavar="N")
+
+parser.add_option("--events", dest="events", type="int", default=200,
+                  help="number of event folders per year. DEFAULT is 200", metavar="N")
+
+parser.add_option("--depth", dest="depth", type="int", default=1,
+                  help="number of nested sub-folders within each event folder. DEFAULT is 1", metavar="N")
+
+parser.add_option("--files-per-event", dest="files_per_event", type="int", default=20,
+                  help="number of files per event folder. DEFAULT is 20", metavar="N")
+
+parser.add_option("--inbox-files", dest="inbox_files", type="int", default=2000,
+                  help="number of files of the synthetic inboxes. DEFAULT is 2000", metavar="N")
+
+parser.add_option("--repeat", dest="repeat", type="int", default=3,
+                  help="number of runs per benchmark; the fastest run counts. DEFAULT is 3", metavar="N")
+
+parser.add_option("--cross-device-dir", dest="cross_device_dir",
+                  help="directory on a different file system for measuring moves across devices", metavar="DIR")
+
+parser.add_option("--startup-budget", dest="startup_budget", type="float", default=30.0,
+                  help="maximum import time of move2archive in milliseconds. DEFAULT is 30", metavar="MS")
+
+parser.add_option("--output", dest="output",
+                  help="write the results as JSON to FILE", metavar="FILE")
+
+parser.add_option("--compare", dest="compare",
+                  help="compare the results with the JSON results in FILE", metavar="FILE")
+
+
+def generate_event_name(randomizer):
+    """returns a random event name like "Hiking Graz Lake" """
+
+    return ' '.join(randomizer.sample(EVENT_NAME_WORDS, 3))
+
+
+def generate_synthetic_archive(archivepath, years, events, depth, files_per_event, seed=42):
+    """creates <archivepath>/<YYYY>/<YYYY-MM-DD event name>/... with
+    events event folders per year, each with depth nested sub-folders
+    and files_per_event empty files (spread over the nested folders).
+
+    @param return: number of created files
+    """
+
+    randomizer = random.Random(seed)
+    number_of_files = 0
+    first_year = datetime.now().year - years + 1
+    for year in range(first_year, first_year + years):
+        yearfolder = os.path.join(archivepath, str(year))
+        os.makedirs(yearfolder, exist_ok=True)
+        for event in range(events):
+            eventdate = datetime(year, 1, 1) + timedelta(days=randomizer.randrange(365))
+            folder = os.path.join(yearfolder, '%s %s %i' % (eventdate.isoformat()[:10], generate_event_name(randomizer), event))
+            folders = [folder]
+            for level in range(depth):
+                folders.append(os.path.join(folders[-1], 'sub%i' % level))
+            os.makedirs(folders[-1])
+            for index in range(files_per_event):
+                filename = '%sT%02d.%02d.00 %s %i.jpg' % (eventdate.isoformat()[:10], index % 24, index % 60,
+                                                          generate_event_name(randomizer), index)
+                open(os.path.join(folders[index % len(folders)], filename), 'w').close()
+                number_of_files += 1
+    return number_of_files
+
+
+def generate_synthetic_inbox(inboxpath, number_of_files, year, eventname='Wedding of Paula and John', seed=23):
+    """creates number_of_files small files named like
+    "<YYYY-MM-DD>T<HH.MM.SS> <eventname> - <random words>.jpg" within
+    inboxpath (created if necessary).
+
+    @param return: list of the file names (with inboxpath)
+    """
+
+    randomizer = random.Random(seed)
+    os.makedirs(inboxpath, exist_ok=True)
+    filenames = []
+    for index in range(number_of_files):
+        timestamp = datetime(year, 6, 11) + timedelta(seconds=index * 7)
+        filename = os.path.join(inboxpath, '%s %s - %s %i.jpg' % (timestamp.strftime('%Y-%m-%dT%H.%M.%S'), eventname,
+                                                                   generate_event_name(randomizer), index))
+        with open(filename, 'wb') as inboxfile:
+            inboxfile.write(b'x' * 1024)
+        filenames.append(filename)
+    return filenames
+
+
+def measure(repeat, function, prepare=None):
+    """returns the fastest wall time of repeat runs of function(); prepare()
+    is called before each run and is not measured"""
+
+    fastest = None
+    for run in range(repeat):
+        if prepare:
+            prepare()
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            function()
+        duration = time.perf_counter() - start
+        if fastest is None or duration < fastest:
+            fastest = duration
+    return fastest
+
+
+def result(seconds, operations):
+    """returns a result entry for the JSON output"""
+
+    return {'seconds': round(seconds, 6),
+            'operations': operations,
+            'operations_per_second': round(operations / seconds, 1) if seconds else None}
+
+
+def benchmark_handle_item(workdir, destination_base, number_of_files, repeat):
+    """measures the throughput of handle_item() moving an inbox into the
+    year folder of an archive located in destination_base"""
+
+    archivepath = os.path.join(destination_base, 'handle_item_archive')
+    inboxpath = os.path.join(workdir, 'handle_item_inbox')
+    year = datetime.now().year
+
+    def prepare():
+        shutil.rmtree(archivepath, ignore_errors=True)
+        shutil.rmtree(inboxpath, ignore_errors=True)
+        os.makedirs(os.path.join(archivepath, str(year)))
+        prepare.filenames = generate_synthetic_inbox(inboxpath, number_of_files, year)
+
+    def run():
+        for filename in prepare.filenames:
+            move2archive.handle_item(filename, archivepath, None)
+
+    seconds = measure(repeat, run, prepare)
+    shutil.rmtree(archivepath, ignore_errors=True)
+    return result(seconds, number_of_files)
+
+
+def benchmark_startup(repeat, budget_seconds):
+    """measures the import time of move2archive with "python3 -X importtime"
+    in fresh interpreters and checks that none of the LAZY_MODULES gets
+    imported at startup"""
+
+    packagedir = os.path.dirname(os.path.dirname(os.path.abspath(move2archive.__file__)))
+    environment = dict(os.environ, PYTHONPATH=packagedir)
+    # measure the startup with byte code as installed programs have it:
+    environment.pop('PYTHONDONTWRITEBYTECODE', None)
+    command = [sys.executable, '-X', 'importtime', '-c',
+               'import sys, move2archive; '
+               'print(",".join(name for name in move2archive.LAZY_MODULES if name in sys.modules))']
+
+    # the first run may have to write the byte code:
+    subprocess.run(command, env=environment, capture_output=True, check=True)
+
+    fastest = None
+    for run in range(repeat):
+        process = subprocess.run(command, env=environment, capture_output=True, text=True, check=True)
+        for line in process.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package"
+            fields = [field.strip() for field in line.split('|')]
+            if len(fields) == 3 and fields[2] == 'move2archive':
+                seconds = int(fields[1]) / 1000000.0
+                if fastest is None or seconds < fastest:
+                    fastest = seconds
+        eagerly_imported = [name for name in process.stdout.strip().split(',') if name]
+
+    entry = result(fastest, 1)
+    entry['budget_seconds'] = budget_seconds
+    entry['eagerly_imported_lazy_modules'] = eagerly_imported
+    entry['within_budget'] = fastest <= budget_seconds and not eagerly_imported
+    return entry
+
+
+def run_benchmarks(settings, workdir):
+    """runs all benchmarks within workdir and returns the results"""
+
+    results = {}
+
+    logging.info('startup ...')
+    results['startup_import'] = benchmark_startup(settings.repeat, settings.startup_budget / 1000.0)
+
+    move2archive.options = move2archive.get_options(batchmode=True)
+    move2archive.VOCABULARY_CACHE_FILE = os.path.join(workdir, 'cache', 'vocabulary.sqlite')
+
+    archivepath = os.path.join(workdir, 'archive')
+    inboxpath = os.path.join(workdir, 'inbox')
+    logging.info('generating synthetic archive and inbox in "%s" ...' % workdir)
+    archive_files = generate_synthetic_archive(archivepath, settings.years, settings.events,
+                                               settings.depth, settings.files_per_event)
+    filenames = generate_synthetic_inbox(inboxpath, settings.inbox_files, datetime.now().year)
+    logging.info('archive: %i files; inbox: %i files' % (archive_files, len(filenames)))
+
+    logging.info('extract_date ...')
+    results['extract_date'] = result(measure(settings.repeat, lambda: [move2archive.extract_date(filename)
+                                                                         for filename in filenames]), len(filenames))
+
+    items = move2archive.parse_items(filenames[:1])
+    indexfile = os.path.join(archivepath, move2archive.ARCHIVE_INDEX_FILENAME)
+    logging.info('get_potential_target_directories ...')
+    results['get_potential_target_directories_cold'] = result(measure(
+        settings.repeat, lambda: move2archive.get_potential_target_directories(items, archivepath),
+        lambda: os.path.exists(indexfile) and os.remove(indexfile)), 1)
+    results['get_potential_target_directories_warm'] = result(measure(
+        settings.repeat, lambda: move2archive.get_potential_target_directories(items, archivepath)), 1)
+
+    logging.info('get_name_matching_directories ...')
+    move2archive.get_name_matching_directories(items, archivepath, [])
+    results['get_name_matching_directories_warm'] = result(measure(
+        settings.repeat, lambda: move2archive.get_name_matching_directories(items, archivepath, [])), 1)
+
+    logging.info('locate_and_parse_controlled_vocabulary ...')
+    results['locate_and_parse_controlled_vocabulary_cold'] = result(measure(
+        settings.repeat, lambda: move2archive.locate_and_parse_controlled_vocabulary(inboxpath),
+        lambda: os.path.exists(move2archive.VOCABULARY_CACHE_FILE) and os.remove(move2archive.VOCABULARY_CACHE_FILE)),
+        len(filenames))
+    results['locate_and_parse_controlled_vocabulary_warm'] = result(measure(
+        settings.repeat, lambda: move2archive.locate_and_parse_controlled_vocabulary(inboxpath)), len(filenames))
+
+    logging.info('longestSubstringFinder and guess_new_directory_basename ...')
+    basenames = [os.path.basename(filename) for filename in filenames]
+    pairs = list(zip(basenames, basenames[1:]))
+    results['longestSubstringFinder'] = result(measure(
+        settings.repeat, lambda: [move2archive.longestSubstringFinder(name1, name2) for name1, name2 in pairs]), len(pairs))
+    results['guess_new_directory_basename'] = result(measure(
+        settings.repeat, lambda: move2archive.guess_new_directory_basename(filenames)), len(filenames))
+
+    logging.info('handle_item on the same device ...')
+    results['handle_item_same_device'] = benchmark_handle_item(workdir, workdir, settings.inbox_files, settings.repeat)
+
+    if settings.cross_device_dir:
+        if os.stat(settings.cross_device_dir).st_dev == os.stat(workdir).st_dev:
+            logging.warning('"%s" is on the same device as "%s"; not measuring moves across devices' %
+                            (settings.cross_device_dir, workdir))
+        else:
+            logging.info('handle_item across devices ...')
+            crossdir = tempfile.mkdtemp(prefix='move2archive-benchmark-', dir=settings.cross_device_dir)
+            try:
+                results['handle_item_cross_device'] = benchmark_handle_item(workdir, crossdir, settings.inbox_files,
+                                                                            settings.repeat)
+            finally:
+                shutil.rmtree(crossdir, ignore_errors=True)
+
+    return results
+
+
+def print_comparison(results, previous_results):
+    """prints the change of each benchmark compared to previous results"""
+
+    for name, current in sorted(results.items()):
+        previous = previous_results.get(name)
+        if not previous or not previous['seconds']:
+            print('%-46s %10.4fs   (new)' % (name, current['seconds']))
+            continue
+        change = (current['seconds'] - previous['seconds']) / previous['seconds'] * 100
+        print('%-46s %10.4fs   %+7.1f%%  (was %.4fs)' % (name, current['seconds'], change, previous['seconds']))
+
+
+def main():
+    """Main function"""
+
+    (settings, args) = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)-8s %(message)s")
+
+    workdir = tempfile.mkdtemp(prefix='move2archive-benchmark-')
+    try:
+        results = run_benchmarks(settings, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {'move2archive_version': move2archive.PROG_VERSION_DATE,
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'date': datetime.now().isoformat(timespec='seconds'),
+              'settings': vars(settings),
+              'results': results}
+
+    if settings.compare:
+        with open(settings.compare, encoding='utf-8') as comparefile:
+            print_comparison(results, json.load(comparefile)['results'])
+    if settings.output:
+        with open(settings.output, 'w', encoding='utf-8') as outputfile:
+            json.dump(report, outputfile, indent=2, sort_keys=True)
+    if not settings.compare and not settings.output:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    startup = results['startup_import']
+    if not startup['within_budget']:
+        logging.error('startup budget exceeded: importing took %.1fms (budget: %.1fms); eagerly imported: %s' %
+                      (startup['seconds'] * 1000, startup['budget_seconds'] * 1000,
+                       ', '.join(startup['eagerly_imported_lazy_modules']) or 'nothing'))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+
+        logging.info("Received KeyboardInterrupt")
+
+# END OF FILE #################################################################
+# end
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tests use the move2archive package of this source tree:
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
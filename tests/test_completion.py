@@ -0,0 +1,19 @@
+"""checks that TAB completion offers the words of the file names most
+frequent first"""
+
+import move2archive
+
+
+def test_matches_keep_the_frequency_ranking():
+    vocabulary = move2archive.extract_vocabulary_from_filenames(
+        ['2023-01-11 Paula party.jpg', '2023-01-11 Paula wedding.jpg', '2023-01-11 Paula wedding dance.jpg'])
+    assert vocabulary == ['Paula', 'wedding', 'party', 'dance']
+
+    completer = move2archive.SimpleCompleter(vocabulary + ['Paula'], ['2023-01-11 Paula and John'])
+    assert completer.find_matches('') == ['Paula', 'wedding', 'party', 'dance']
+    assert completer.find_matches('Pa', 'Pa') == ['Paula']
+    assert completer.find_matches('d', 'party d', 6) == ['dance']
+    assert completer.find_matches('20', '20') == ['2023-01-11 Paula and John']
+
+    completer = move2archive.SimpleCompleter(['wedding', 'party', 'wed'])
+    assert completer.find_matches('we', 'we') == ['wedding', 'wed']
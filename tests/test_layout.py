@@ -0,0 +1,18 @@
+"""checks the recognition of the folders created by "--layout" """
+
+import move2archive
+
+
+def test_is_layout_directory():
+    move2archive.options = move2archive.get_options(layout='{year}/{year}-{month}-{day}')
+    assert move2archive.is_layout_directory('2023')
+    assert move2archive.is_layout_directory('2023/2023-01-11')
+    assert not move2archive.is_layout_directory('2023/2023-01-11 Party')
+    assert not move2archive.is_layout_directory('2023/2023-01-11/2023-01-11 Party')
+
+    move2archive.options = move2archive.get_options(layout='{year}/{bucket}')
+    assert move2archive.is_layout_directory('2023/0f')
+    assert not move2archive.is_layout_directory('2023/2023-01-11')
+
+    move2archive.options = move2archive.get_options()
+    assert not move2archive.is_layout_directory('2023/2023-01-11')
@@ -0,0 +1,36 @@
+"""checks the suffix automaton of longest_common_substring() against a
+brute-force search"""
+
+import random
+
+import move2archive
+
+
+def brute_force_longest_common_substring(strings):
+    """the longest substring of the (first) shortest string which is in all
+    strings; the one occurring first if there are several"""
+
+    base = min(strings, key=len)
+    for length in range(len(base), 0, -1):
+        for start in range(len(base) - length + 1):
+            candidate = base[start:start + length]
+            if all(candidate in string for string in strings):
+                return candidate
+    return ""
+
+
+def test_examples():
+    assert move2archive.longestSubstringFinder("apple pie available", "apple pies") == "apple pie"
+    assert move2archive.longestSubstringFinder("apples", "appleses") == "apples"
+    assert move2archive.longestSubstringFinder("bapples", "cappleses") == "apples"
+    assert move2archive.longest_common_substring([]) == ""
+    assert move2archive.longest_common_substring(["abc", "xyz"]) == ""
+
+
+def test_random_strings():
+    randomizer = random.Random(42)
+    for run in range(2000):
+        alphabet = 'ab' if run % 2 else 'abcd '
+        strings = [''.join(randomizer.choice(alphabet) for index in range(randomizer.randrange(0, 15)))
+                   for number in range(randomizer.randrange(1, 5))]
+        assert move2archive.longest_common_substring(strings) == brute_force_longest_common_substring(strings), strings
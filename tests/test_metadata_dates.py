@@ -0,0 +1,140 @@
+"""checks the readers of capture dates of "--metadata-dates" with small
+synthetic JPEG, TIFF and MP4 files"""
+
+import struct
+from datetime import datetime
+
+import move2archive
+
+ASCII = 2
+LONG = 4
+EXIF_IFD_POINTER = 0x8769
+DATETIME = 0x0132
+DATETIME_ORIGINAL = 0x9003
+DATETIME_DIGITIZED = 0x9004
+
+
+def build_tiff(byteorder, ifd0_dates, exif_dates=None):
+    """returns TIFF data with ASCII date tags (dicts of tag -> date text) in
+    IFD0 and in an EXIF IFD referenced by tag 0x8769 (if exif_dates is given)"""
+
+    order = '<' if byteorder == 'II' else '>'
+    ifd0_entries = len(ifd0_dates) + (1 if exif_dates is not None else 0)
+    exif_offset = 8 + 2 + 12 * ifd0_entries + 4
+    data_offset = exif_offset
+    if exif_dates is not None:
+        data_offset += 2 + 12 * len(exif_dates) + 4
+
+    data = b''
+
+    def ifd(dates, extra_entries=()):
+        nonlocal data
+        entries = list(extra_entries)
+        for tag, text in sorted(dates.items()):
+            value = text.encode('ascii') + b'\x00'
+            entries.append(struct.pack(order + 'HHII', tag, ASCII, len(value), data_offset + len(data)))
+            data += value
+        return struct.pack(order + 'H', len(entries)) + b''.join(entries) + struct.pack(order + 'I', 0)
+
+    pointer = []
+    if exif_dates is not None:
+        pointer.append(struct.pack(order + 'HHII', EXIF_IFD_POINTER, LONG, 1, exif_offset))
+    tiff = (byteorder.encode('ascii') + struct.pack(order + 'HI', 42, 8) + ifd(ifd0_dates, pointer))
+    if exif_dates is not None:
+        tiff += ifd(exif_dates)
+    return tiff + data
+
+
+def build_jpeg(tiff):
+    """returns the start of a JPEG file with a JFIF and an EXIF segment"""
+
+    jfif = b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    exif = b'Exif\x00\x00' + tiff
+    return (b'\xff\xd8' +
+            b'\xff\xe0' + struct.pack('>H', 2 + len(jfif)) + jfif +
+            b'\xff\xe1' + struct.pack('>H', 2 + len(exif)) + exif +
+            b'\xff\xda\x00\x02' + b'\x00' * 64)
+
+
+def box(box_type, content):
+    return struct.pack('>I', 8 + len(content)) + box_type + content
+
+
+def build_mp4(version, creation_time):
+    """returns an MP4 file with a movie header ("moov/mvhd") of version 0 or 1"""
+
+    if version == 1:
+        times = struct.pack('>QQ', creation_time, creation_time)
+    else:
+        times = struct.pack('>II', creation_time, creation_time)
+    mvhd = box(b'mvhd', bytes([version, 0, 0, 0]) + times + b'\x00' * 80)
+    return (box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41') +
+            box(b'mdat', b'\x00' * 1000) +
+            box(b'moov', box(b'trak', b'\x00' * 16) + mvhd))
+
+
+def seconds_since_1904(date):
+    return int((date - datetime(1904, 1, 1)).total_seconds())
+
+
+def read_date(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return move2archive.read_metadata_date(str(path))
+
+
+def test_jpeg_exif_date_original(tmp_path):
+    jpeg = build_jpeg(build_tiff('II', {DATETIME: '2019:01:01 00:00:00'},
+                                 {DATETIME_ORIGINAL: '2021:07:14 10:11:12'}))
+    assert read_date(tmp_path, 'IMG_0001.jpg', jpeg) == datetime(2021, 7, 14)
+
+
+def test_jpeg_falls_back_to_digitized_and_datetime(tmp_path):
+    jpeg = build_jpeg(build_tiff('MM', {DATETIME: '2019:01:02 00:00:00'},
+                                 {DATETIME_DIGITIZED: '2020:02:29 23:59:59'}))
+    assert read_date(tmp_path, 'digitized.jpg', jpeg) == datetime(2020, 2, 29)
+    jpeg = build_jpeg(build_tiff('MM', {DATETIME: '2019:01:02 00:00:00'}, {}))
+    assert read_date(tmp_path, 'datetime.jpg', jpeg) == datetime(2019, 1, 2)
+
+
+def test_jpeg_without_exif(tmp_path):
+    jpeg = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00\xff\xda\x00\x02' + b'\x00' * 64
+    assert read_date(tmp_path, 'plain.jpg', jpeg) is None
+
+
+def test_tiff_with_exif_ifd_pointer(tmp_path):
+    for byteorder in ('II', 'MM'):
+        tiff = build_tiff(byteorder, {DATETIME: '2018:05:06 07:08:09'}, {DATETIME_ORIGINAL: '2017:12:31 22:00:00'})
+        assert read_date(tmp_path, 'raw.tif', tiff) == datetime(2017, 12, 31)
+        assert move2archive.get_exif_date(tiff) == datetime(2017, 12, 31)
+
+
+def test_invalid_exif_date():
+    assert move2archive.get_exif_date(build_tiff('II', {DATETIME: '0000:00:00 00:00:00'})) is None
+
+
+def test_mp4_movie_header_versions(tmp_path):
+    date = datetime(2022, 8, 15, 18, 30)
+    assert read_date(tmp_path, 'v0.mp4', build_mp4(0, seconds_since_1904(date))) == datetime(2022, 8, 15)
+    assert read_date(tmp_path, 'v1.mp4', build_mp4(1, seconds_since_1904(date))) == datetime(2022, 8, 15)
+
+
+def test_mp4_without_creation_time(tmp_path):
+    assert read_date(tmp_path, 'zero.mp4', build_mp4(0, 0)) is None
+
+
+def test_mp4_creation_time_out_of_range(tmp_path):
+    assert read_date(tmp_path, 'huge.mp4', build_mp4(1, 2 ** 63)) is None
+    assert read_date(tmp_path, 'year10000.mp4', build_mp4(1, seconds_since_1904(datetime(9999, 12, 31)) + 86400)) is None
+
+
+def test_truncated_headers(tmp_path):
+    jpeg = build_jpeg(build_tiff('II', {}, {DATETIME_ORIGINAL: '2021:07:14 10:11:12'}))
+    tiff = build_tiff('MM', {DATETIME: '2018:05:06 07:08:09'}, {DATETIME_ORIGINAL: '2017:12:31 22:00:00'})
+    mp4 = build_mp4(1, seconds_since_1904(datetime(2022, 8, 15)))
+    for name, content in (('cut.jpg', jpeg), ('cut.tif', tiff), ('cut.mp4', mp4)):
+        for size in range(8, len(content), 7):
+            # no exception, just no date (or a date found before the cut):
+            assert read_date(tmp_path, name, content[:size]) in (None, datetime(2021, 7, 14),
+                                                                 datetime(2017, 12, 31), datetime(2018, 5, 6),
+                                                                 datetime(2022, 8, 15))
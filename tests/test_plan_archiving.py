@@ -0,0 +1,43 @@
+"""checks the library functions plan_archiving() and execute_move_plan()"""
+
+import pytest
+
+import move2archive
+
+
+def test_moves_quietly_into_year_folder(tmp_path, capsys):
+    (tmp_path / 'archive' / '2023').mkdir(parents=True)
+    item = tmp_path / '2023-01-11 party.jpg'
+    item.write_bytes(b'jpeg')
+
+    plan = move2archive.plan_archiving([str(item)], str(tmp_path / 'archive'))
+    move2archive.execute_move_plan(plan)
+
+    assert (tmp_path / 'archive' / '2023' / '2023-01-11 party.jpg').exists()
+    assert '→' not in capsys.readouterr().out
+
+
+def test_prints_moves_if_not_quiet(tmp_path, capsys):
+    (tmp_path / 'archive' / '2023').mkdir(parents=True)
+    item = tmp_path / '2023-01-11 party.jpg'
+    item.write_bytes(b'jpeg')
+
+    move2archive.archive_items([str(item)], str(tmp_path / 'archive'),
+                               settings=move2archive.get_options(quiet=False))
+
+    assert '→' in capsys.readouterr().out
+
+
+def test_invalid_settings(tmp_path):
+    item = tmp_path / '2023-01-11 party.jpg'
+    item.write_bytes(b'jpeg')
+
+    for settings in (move2archive.get_options(jobs=0), move2archive.get_options(layout='{month}'),
+                     move2archive.get_options(archive_roots=['2020-2019=/tmp']), move2archive.get_options(name_suggestions=-1)):
+        with pytest.raises(move2archive.ArchiveError) as error:
+            move2archive.plan_archiving([str(item)], str(tmp_path), settings=settings)
+        assert error.value.errorcode == 14
+
+    with pytest.raises(move2archive.ArchiveError) as error:
+        move2archive.plan_archiving([str(item)], str(tmp_path / 'missing'))
+    assert error.value.errorcode == 1